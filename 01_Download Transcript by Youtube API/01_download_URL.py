@@ -1,45 +1,302 @@
 import csv
+import json
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 import time
 import os
+import sys
+import math
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse, parse_qs
 
 # Load environment variables from .env file
 load_dotenv()
 
-def get_video_details(youtube, video_id):
+# videos().list accepts at most 50 comma-separated IDs per request
+MAX_IDS_PER_DETAILS_CALL = 50
+
+# YouTube Data API v3 quota cost (units) of each method we call
+API_UNIT_COSTS = {
+    'search.list': 100,
+    'videos.list': 1,
+}
+# A search page is only worth starting if its details call can be paid for too
+SEARCH_PAGE_COST = API_UNIT_COSTS['search.list'] + API_UNIT_COSTS['videos.list']
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')  # The daily quota resets at midnight Pacific Time
+except Exception:
+    QUOTA_TIMEZONE = timezone(timedelta(hours=-8))  # No tz database available; ignore daylight saving time
+
+def quota_day():
+    return datetime.now(QUOTA_TIMEZONE).date().isoformat()
+
+@contextmanager
+def atomic_write(path, mode='w', **open_kwargs):
+    """Write `path` through a temporary file that replaces it only once the block completes,
+    so readers (and the next run after a crash) never see a half-written file"""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
     try:
-        request = youtube.videos().list(
-            part="snippet,statistics,contentDetails",
-            id=video_id
-        )
-        response = request.execute()
-
-        if 'items' in response and len(response['items']) > 0:
-            video = response['items'][0]
-            snippet = video['snippet']
-            statistics = video['statistics']
-            content_details = video['contentDetails']
-
-            # Parse duration
-            duration = content_details['duration']
-            duration_obj = parse_duration(duration)
-
-            return {
-                'comment_count': int(statistics.get('commentCount', 0)),
-                'like_count': int(statistics.get('likeCount', 0)),
-                'view_count': int(statistics.get('viewCount', 0)),
-                'duration': str(duration_obj),
-                'description': snippet.get('description', ''),
-                'tags': ', '.join(snippet.get('tags', [])),
-                'category_id': snippet.get('categoryId', '')
-            }
-    except HttpError as e:
-        print(f"An HTTP error {e.resp.status} occurred: {e.content}")
+        with open(temp_path, mode, **open_kwargs) as file:
+            yield file
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def extract_video_id(url):
+    """YouTube video ID of a watch, youtu.be, /embed/ or /v/ URL, or None"""
+    parsed_url = urlparse(url)
+    if parsed_url.hostname in ('youtu.be', 'www.youtu.be'):
+        return parsed_url.path[1:]
+    if parsed_url.hostname in ('youtube.com', 'www.youtube.com'):
+        if parsed_url.path == '/watch':
+            return parse_qs(parsed_url.query).get('v', [None])[0]
+        if parsed_url.path[:7] == '/embed/':
+            return parsed_url.path.split('/')[2]
+        if parsed_url.path[:3] == '/v/':
+            return parsed_url.path.split('/')[2]
     return None
 
+class TokenBucket:
+    """Thread-safe token bucket limiting request rate; shared by all threads that acquire it"""
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class QuotaBudget:
+    """Thread-safe running total of quota units shared by all crawler threads.
+
+    With a `ledger_path`, the units spent are saved after every call and reloaded by later
+    runs on the same quota day, so a rerun (e.g. --resume after a crash) only spends what is
+    actually left of the daily quota. Units held for a follow-up call (see try_spend) count
+    against the limit but are only saved once spent.
+    """
+    def __init__(self, limit, ledger_path=None):
+        self.limit = limit
+        self.ledger_path = ledger_path
+        self.day = quota_day()
+        self.used = 0
+        self.held = 0
+        self.calls = {method: 0 for method in API_UNIT_COSTS}
+        self.lock = threading.Lock()
+        if ledger_path and os.path.exists(ledger_path):
+            with open(ledger_path, 'r', encoding='utf-8') as file:
+                ledger = json.load(file)
+            if ledger.get('day') == self.day:
+                self.used = ledger['used']
+                print(f"{self.used} quota units already spent today ({self.day} Pacific Time).")
+
+    def save(self):
+        with atomic_write(self.ledger_path, encoding='utf-8') as file:
+            json.dump({'day': self.day, 'used': self.used}, file)
+
+    def try_spend(self, method, reserve=0):
+        """Charge one call to `method` and hold `reserve` more units, refusing if that would exceed the limit.
+
+        Held units cannot be taken by other threads; use them with spend_held() or give them
+        back with release().
+        """
+        units = API_UNIT_COSTS[method]
+        with self.lock:
+            if quota_day() != self.day:
+                # Midnight Pacific Time passed during the crawl: a fresh daily quota
+                self.day = quota_day()
+                self.used = 0
+            if self.used + self.held + units + reserve > self.limit:
+                return False
+            self.held += reserve
+            self.charge(method)
+            return True
+
+    def spend_held(self, method):
+        """Charge one call to `method` against units held by an earlier try_spend"""
+        with self.lock:
+            self.held -= API_UNIT_COSTS[method]
+            self.charge(method)
+
+    def release(self, units):
+        with self.lock:
+            self.held -= units
+
+    def charge(self, method):
+        # Caller holds self.lock
+        self.used += API_UNIT_COSTS[method]
+        self.calls[method] += 1
+        if self.ledger_path:
+            self.save()  # Before the call is made, so a crash never under-counts
+
+    def remaining(self):
+        with self.lock:
+            return self.limit - self.used - self.held
+
+    def exhausted(self):
+        return self.remaining() < SEARCH_PAGE_COST
+
+    def summary(self):
+        with self.lock:
+            calls = ', '.join(f"{method}: {count} calls ({count * API_UNIT_COSTS[method]} units)" for method, count in self.calls.items())
+            return f"Quota used: {self.used}/{self.limit} units ({calls})"
+
+class SeenVideos:
+    """Thread-safe set of YouTube video IDs that are known or already claimed in this run"""
+    def __init__(self, known_ids=()):
+        self.ids = set(known_ids)
+        self.lock = threading.Lock()
+
+    def claim(self, video_id):
+        """Return True the first time `video_id` is seen, False for known or duplicate hits"""
+        with self.lock:
+            if video_id in self.ids:
+                return False
+            self.ids.add(video_id)
+            return True
+
+    def release(self, video_ids):
+        """Forget claims whose videos were not collected, so a retry of their page can claim them again"""
+        with self.lock:
+            self.ids.difference_update(video_ids)
+
+class CrawlCheckpoint:
+    """Per-keyword crawl progress (collected videos and next page token), saved after every page"""
+    def __init__(self, path, state=None):
+        self.path = path
+        self.state = state if state is not None else {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as file:
+            state = json.load(file)
+        for progress in state.values():
+            progress['videos'] = [tuple(video) for video in progress['videos']]
+        return cls(path, state)
+
+    def get(self, keyword):
+        with self.lock:
+            return self.state.get(keyword, {'videos': [], 'next_page_token': None, 'done': False})
+
+    def update(self, keyword, videos, next_page_token, done):
+        with self.lock:
+            self.state[keyword] = {'videos': list(videos), 'next_page_token': next_page_token, 'done': done}
+            with atomic_write(self.path, encoding='utf-8') as file:
+                json.dump(self.state, file, ensure_ascii=False)
+
+    def video_ids(self):
+        with self.lock:
+            return {extract_video_id(video[1]) for progress in self.state.values() for video in progress['videos']}
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def call_api(request, method, rate_limiter=None, budget=None, reserve=0, held=False):
+    """Execute a prepared API request, charging its real unit cost to the shared budget.
+
+    `reserve` units are held for a follow-up call, which then passes `held=True`.
+    """
+    if budget is not None:
+        if held:
+            budget.spend_held(method)
+        elif not budget.try_spend(method, reserve):
+            return None
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+    try:
+        return request.execute()
+    except Exception:
+        if budget is not None and reserve:
+            budget.release(reserve)  # No follow-up call without this one's response
+        raise
+
+def plan_crawl(keywords, max_results_per_keyword, quota_limit, match_rate):
+    """Estimate quota units per keyword without calling the API.
+
+    Each search page costs one search.list plus one batched videos.list call; the number
+    of pages depends on how many of the 50 hits per page pass the title filter (`match_rate`).
+    """
+    matches_per_page = max(1, int(50 * match_rate))
+    pages_per_keyword = math.ceil(max_results_per_keyword / matches_per_page)
+    units_per_keyword = pages_per_keyword * SEARCH_PAGE_COST
+
+    total_units = 0
+    affordable_keywords = 0
+    for keyword in keywords:
+        total_units += units_per_keyword
+        if total_units <= quota_limit:
+            affordable_keywords += 1
+        print(f"'{keyword}': ~{pages_per_keyword} pages, ~{units_per_keyword} units (running total {total_units})")
+
+    print(f"Estimated total: {total_units} units of {quota_limit} available.")
+    if affordable_keywords < len(keywords):
+        print(f"Budget covers about {affordable_keywords} of {len(keywords)} keywords; the rest will be skipped.")
+    return total_units
+
+def parse_video_item(video):
+    snippet = video['snippet']
+    statistics = video['statistics']
+    content_details = video['contentDetails']
+
+    # Parse duration
+    duration = content_details['duration']
+    duration_obj = parse_duration(duration)
+
+    return {
+        'comment_count': int(statistics.get('commentCount', 0)),
+        'like_count': int(statistics.get('likeCount', 0)),
+        'view_count': int(statistics.get('viewCount', 0)),
+        'duration': str(duration_obj),
+        'description': snippet.get('description', ''),
+        'tags': ', '.join(snippet.get('tags', [])),
+        'category_id': snippet.get('categoryId', '')
+    }
+
+def get_video_details_batch(youtube, video_ids, rate_limiter=None, budget=None, held=False):
+    """Resolve up to 50 video IDs with a single videos().list call (1 quota unit).
+
+    With `held`, the first call is paid from units held by the search call. Returns None if
+    a call failed or was refused by the budget, so the caller can retry the whole page.
+    """
+    details_by_id = {}
+    for start in range(0, len(video_ids), MAX_IDS_PER_DETAILS_CALL):
+        batch = video_ids[start:start + MAX_IDS_PER_DETAILS_CALL]
+        try:
+            request = youtube.videos().list(
+                part="snippet,statistics,contentDetails",
+                id=",".join(batch)
+            )
+            response = call_api(request, 'videos.list', rate_limiter, budget, held=held and start == 0)
+            if response is None:
+                print("Quota budget exhausted. Skipping video details.")
+                return None
+
+            for video in response.get('items', []):
+                details_by_id[video['id']] = parse_video_item(video)
+        except HttpError as e:
+            print(f"An HTTP error {e.resp.status} occurred: {e.content}")
+            return None
+    return details_by_id
+
 def parse_duration(duration):
     """Convert YouTube API duration format to timedelta"""
     duration = duration[2:]  # Remove 'PT' from the beginning
@@ -49,9 +306,16 @@ def parse_duration(duration):
     seconds = duration.split('S')[0] if 'S' in duration else 0
     return timedelta(days=int(days), hours=int(hours), minutes=int(minutes), seconds=int(seconds))
 
-def search_videos_by_keyword(youtube, keyword, max_results):
+def search_videos_by_keyword(youtube, keyword, max_results, rate_limiter=None, budget=None, seen=None, checkpoint=None):
+    if rate_limiter is None:
+        rate_limiter = TokenBucket(rate=1, capacity=1)  # Respect YouTube API rate limits
     videos = []
     next_page_token = None
+    if checkpoint is not None:
+        # Continue from the last saved page of this keyword, if any
+        progress = checkpoint.get(keyword)
+        videos = list(progress['videos'])
+        next_page_token = progress['next_page_token']
     
     while len(videos) < max_results:
         try:
@@ -62,22 +326,51 @@ def search_videos_by_keyword(youtube, keyword, max_results):
                 maxResults=50,  # API maximum per request
                 pageToken=next_page_token
             )
-            response = request.execute()
+            response = call_api(request, 'search.list', rate_limiter, budget, reserve=API_UNIT_COSTS['videos.list'])
+            if response is None:
+                print(f"Quota budget exhausted. Stopping search for '{keyword}'.")
+                break
             
+            matches = []
+            known_count = 0
             for item in response['items']:
                 video_title = item['snippet']['title']
                 video_id = item['id']['videoId']
-                video_url = f"https://www.youtube.com/watch?v={video_id}"
                 if 'electrical' in video_title.lower() or 'construction' in video_title.lower():
-                    video_details = get_video_details(youtube, video_id)
-                    if video_details:
-                        videos.append((video_title, video_url, keyword, video_details))
+                    # Skip videos already in the catalog (or found by another keyword) before paying for details
+                    if seen is not None and not seen.claim(video_id):
+                        known_count += 1
+                        continue
+                    matches.append((video_id, video_title))
+            if known_count:
+                print(f"Skipped {known_count} known videos for '{keyword}'")
+
+            # One videos().list call for the whole page instead of one per hit, paid from the unit held above
+            if matches:
+                details_by_id = get_video_details_batch(youtube, [video_id for video_id, _ in matches], rate_limiter, budget,
+                                                        held=budget is not None)
+            else:
+                details_by_id = {}
+                if budget is not None:
+                    budget.release(API_UNIT_COSTS['videos.list'])
+            if details_by_id is None:
+                # Keep the page token where it was, so --resume asks for this page again
+                if seen is not None:
+                    seen.release([video_id for video_id, _ in matches])
+                print(f"Could not get video details for '{keyword}'. Stopping search (resumable).")
+                break
+            for video_id, video_title in matches:
+                video_details = details_by_id.get(video_id)
+                if video_details:
+                    video_url = f"https://www.youtube.com/watch?v={video_id}"
+                    videos.append((video_title, video_url, keyword, video_details))
             
             next_page_token = response.get('nextPageToken')
-            if not next_page_token or len(videos) >= max_results:
+            done = not next_page_token or len(videos) >= max_results
+            if checkpoint is not None:
+                checkpoint.update(keyword, videos, next_page_token, done)
+            if done:
                 break
-            
-            time.sleep(1)  # Respect YouTube API rate limits
         
         except HttpError as e:
             print(f"An HTTP error {e.resp.status} occurred: {e.content}")
@@ -85,80 +378,228 @@ def search_videos_by_keyword(youtube, keyword, max_results):
     
     return videos[:max_results]
 
-def collect_videos(youtube, keywords, max_results_per_keyword, quota_limit):
-    all_videos = []
-    for keyword in keywords:
+def collect_videos(youtube, keywords, max_results_per_keyword, quota_limit, max_workers=4, requests_per_second=5, known_ids=(), checkpoint=None,
+                   quota_ledger=None):
+    """Search several keywords at once under a shared rate limiter and quota budget.
+
+    `youtube` is either a client object or a zero-argument factory returning one;
+    a factory is called once per worker thread, since API clients are not thread-safe.
+    Videos whose IDs are in `known_ids` are skipped before any details call.
+    With a `checkpoint`, finished keywords are not searched again and unfinished
+    ones continue from their saved page token.
+    Units spent today are tracked in `quota_ledger` (see QuotaBudget).
+    """
+    rate_limiter = TokenBucket(rate=requests_per_second)
+    budget = QuotaBudget(quota_limit, quota_ledger)
+    seen = SeenVideos(known_ids)
+    if checkpoint is not None:
+        for video_id in checkpoint.video_ids():
+            seen.claim(video_id)
+    thread_local = threading.local()
+
+    def get_client():
+        if not callable(youtube):
+            return youtube
+        if not hasattr(thread_local, 'client'):
+            thread_local.client = youtube()
+        return thread_local.client
+
+    def search(keyword):
+        if checkpoint is not None and checkpoint.get(keyword)['done']:
+            videos = checkpoint.get(keyword)['videos']
+            print(f"Restored {len(videos)} videos for '{keyword}' from checkpoint")
+            return videos[:max_results_per_keyword]
+        if budget.exhausted():
+            return []
         print(f"Searching for '{keyword}'...")
-        videos = search_videos_by_keyword(youtube, keyword, max_results_per_keyword)
-        all_videos.extend(videos)
+        videos = search_videos_by_keyword(get_client(), keyword, max_results_per_keyword, rate_limiter, budget, seen, checkpoint)
         print(f"Found {len(videos)} videos for '{keyword}'")
-        
-        if len(all_videos) >= quota_limit:
-            print("Approaching daily quota limit. Stopping search.")
-            break
+        return videos
+
+    all_videos = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # map() yields in keyword order, so output is deterministic regardless of timing
+        for videos in executor.map(search, keywords):
+            all_videos.extend(videos)
+
+    if budget.exhausted():
+        print("Approaching daily quota limit. Stopped search.")
+    print(budget.summary())
     return all_videos
 
-def load_existing_videos(file_path):
-    existing_videos = []
-    if os.path.exists(file_path):
-        with open(file_path, 'r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                video_details = {
-                    'comment_count': int(row.get('Comment Count', 0)),
-                    'like_count': int(row.get('Like Count', 0)),
-                    'view_count': int(row.get('View Count', 0)),
-                    'duration': row.get('Duration', ''),
-                    'description': row.get('Description', ''),
-                    'tags': row.get('Tags', ''),
-                    'category_id': row.get('Category ID', '')
-                }
-                existing_videos.append((
-                    row['Title'], 
-                    row['URL'], 
-                    row.get('Keyword', ''),  # Keyword might not exist in old format
-                    video_details
-                ))
-    return existing_videos
-
-def remove_duplicates(videos):
-    unique_videos = list({video[1]: video for video in videos}.values())
-    duplicate_count = len(videos) - len(unique_videos)
-    print(f"Duplicate videos removed: {duplicate_count}")
-    return unique_videos
+CATALOG_FIELDNAMES = ['VideoID', 'Title', 'URL', 'Keyword', 'Comment Count', 'Like Count', 'View Count', 'Duration', 'Description', 'Tags', 'Category ID']
+
+def get_index_path(output_file):
+    return f"{os.path.splitext(output_file)[0]}_index.csv"
+
+# Each index row records where its catalog row ends, so a catalog row whose index row was never
+# written (an interrupted save) is found by comparing the last End with the catalog's size
+INDEX_FIELDNAMES = ['URL', 'VideoID', 'End']
+
+def scan_catalog(output_file, start=None):
+    """Yield (URL, VideoID, end offset) for catalog rows from byte `start` (default: after the header)"""
+    with open(output_file, 'r', newline='', encoding='utf-8') as csvfile:
+        # readline() instead of iteration keeps tell() usable; rows may span lines (descriptions)
+        reader = csv.reader(iter(csvfile.readline, ''))
+        header = next(reader)
+        url_column, id_column = header.index('URL'), header.index('VideoID')
+        if start is not None:
+            csvfile.seek(start)
+        for row in reader:
+            if row:
+                yield row[url_column], int(row[id_column]), csvfile.tell()
+
+def rebuild_catalog_index(output_file, index_file):
+    """Full scan of an existing catalog to recover its URL -> VideoID mapping"""
+    url_to_id = {}
+    with open(index_file, 'w', newline='', encoding='utf-8') as indexfile:
+        writer = csv.writer(indexfile)
+        writer.writerow(INDEX_FIELDNAMES)
+        for url, video_id, end in scan_catalog(output_file):
+            if url not in url_to_id:
+                url_to_id[url] = video_id
+            writer.writerow([url, video_id, end])
+    print(f"Rebuilt catalog index '{index_file}' with {len(url_to_id)} videos.")
+    return url_to_id
+
+def load_catalog_index(output_file):
+    """Load the persistent URL -> VideoID index, reconciled with the catalog it describes.
+
+    Catalog rows past the index's last End (appended by a save that was interrupted before
+    its index rows were written) are read from the catalog's tail and indexed. An index
+    that is older than this format, or ends past the catalog, is rebuilt from scratch.
+    """
+    index_file = get_index_path(output_file)
+    if not os.path.exists(output_file):
+        return {}
+    if not os.path.exists(index_file):
+        return rebuild_catalog_index(output_file, index_file)
+    url_to_id = {}
+    last_end = None
+    with open(index_file, 'r', newline='', encoding='utf-8') as indexfile:
+        reader = csv.reader(indexfile)
+        if next(reader, None) != INDEX_FIELDNAMES:
+            return rebuild_catalog_index(output_file, index_file)
+        for url, video_id, end in reader:
+            url_to_id.setdefault(url, int(video_id))
+            last_end = int(end)
+
+    catalog_size = os.path.getsize(output_file)
+    if last_end is not None and last_end > catalog_size:
+        return rebuild_catalog_index(output_file, index_file)
+    if last_end != catalog_size:
+        try:
+            missing = list(scan_catalog(output_file, last_end))
+        except (ValueError, IndexError):
+            return rebuild_catalog_index(output_file, index_file)
+        if missing:
+            with open(index_file, 'a', newline='', encoding='utf-8') as indexfile:
+                csv.writer(indexfile).writerows(missing)
+            for url, video_id, _ in missing:
+                url_to_id.setdefault(url, video_id)
+            print(f"Indexed {len(missing)} catalog rows missing from '{index_file}'.")
+    return url_to_id
+
+def load_known_video_ids(output_file):
+    """YouTube video IDs already in the catalog, read from its URL -> VideoID index"""
+    known_ids = {extract_video_id(url) for url in load_catalog_index(output_file)}
+    known_ids.discard(None)
+    print(f"Loaded {len(known_ids)} known videos from the catalog index.")
+    return known_ids
 
 def save_to_csv(videos, output_file):
-    existing_videos = load_existing_videos(output_file)
-    all_videos = existing_videos + videos
-    unique_videos = remove_duplicates(all_videos)
-    
-    videos_with_id = [(i+1, *video) for i, video in enumerate(unique_videos)]
-    
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['VideoID', 'Title', 'URL', 'Keyword', 'Comment Count', 'Like Count', 'View Count', 'Duration', 'Description', 'Tags', 'Category ID']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for video in videos_with_id:
-            writer.writerow({
-                'VideoID': video[0],
-                'Title': video[1],
-                'URL': video[2],
-                'Keyword': video[3],
-                'Comment Count': video[4]['comment_count'],
-                'Like Count': video[4]['like_count'],
-                'View Count': video[4]['view_count'],
-                'Duration': video[4]['duration'],
-                'Description': video[4]['description'],
-                'Tags': video[4]['tags'],
-                'Category ID': video[4]['category_id']
-            })
-    
-    print(f"CSV file '{output_file}' updated successfully with {len(videos_with_id)} unique videos.")
+    """Append unseen videos to the catalog with stable, never-reused VideoIDs.
+
+    Existing rows are never rewritten: only new videos are appended to the catalog
+    and to its URL -> VideoID index, so work is proportional to the new videos.
+    """
+    url_to_id = load_catalog_index(output_file)
+    next_id = max(url_to_id.values(), default=0) + 1
+
+    new_rows = []
+    duplicate_count = 0
+    for title, url, keyword, details in videos:
+        if url in url_to_id:
+            duplicate_count += 1
+            continue
+        url_to_id[url] = next_id
+        new_rows.append({
+            'VideoID': next_id,
+            'Title': title,
+            'URL': url,
+            'Keyword': keyword,
+            'Comment Count': details['comment_count'],
+            'Like Count': details['like_count'],
+            'View Count': details['view_count'],
+            'Duration': details['duration'],
+            'Description': details['description'],
+            'Tags': details['tags'],
+            'Category ID': details['category_id']
+        })
+        next_id += 1
+    print(f"Duplicate videos skipped: {duplicate_count}")
+
+    file_exists = os.path.exists(output_file)
+    fieldnames = CATALOG_FIELDNAMES
+    if file_exists:
+        # Keep the existing header (older catalogs only have VideoID, Title, URL, Keyword)
+        with open(output_file, 'r', newline='', encoding='utf-8') as csvfile:
+            fieldnames = next(csv.reader(csvfile), CATALOG_FIELDNAMES)
+
+    # Catalog first; rows it gains without index rows are picked up by the next load_catalog_index
+    index_rows = []
+    with open(output_file, 'a', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
+        if not file_exists:
+            writer.writeheader()
+        for row in new_rows:
+            writer.writerow(row)
+            index_rows.append((row['URL'], row['VideoID'], csvfile.tell()))
+
+    # A new catalog starts a new index; otherwise the index was loaded (or rebuilt) above
+    index_file = get_index_path(output_file)
+    with open(index_file, 'a' if file_exists else 'w', newline='', encoding='utf-8') as indexfile:
+        writer = csv.writer(indexfile)
+        if not file_exists:
+            writer.writerow(INDEX_FIELDNAMES)
+        writer.writerows(index_rows)
+
+    print(f"CSV file '{output_file}' updated successfully with {len(new_rows)} new videos ({len(url_to_id)} total).")
+
+def get_checkpoint_path(output_file):
+    return f"{os.path.splitext(output_file)[0]}_checkpoint.json"
+
+def get_quota_ledger_path(output_file):
+    return f"{os.path.splitext(output_file)[0]}_quota.json"
+
+def main(output_file, keywords, max_results_per_keyword, quota_limit, resume=False):
+    if PLAN_ONLY:
+        plan_crawl(keywords, max_results_per_keyword, QuotaBudget(quota_limit, get_quota_ledger_path(output_file)).remaining(),
+                   ESTIMATED_MATCH_RATE)
+        return
+    def youtube():
+        return build(API_SERVICE_NAME, API_VERSION, developerKey=YOUTUBE_API_KEY)
+    known_ids = load_known_video_ids(output_file)
+
+    checkpoint_path = get_checkpoint_path(output_file)
+    if resume and os.path.exists(checkpoint_path):
+        checkpoint = CrawlCheckpoint.load(checkpoint_path)
+        print(f"Resuming crawl from checkpoint '{checkpoint_path}'")
+    else:
+        if os.path.exists(checkpoint_path):
+            print(f"Ignoring existing checkpoint '{checkpoint_path}' (run with --resume to continue it)")
+        checkpoint = CrawlCheckpoint(checkpoint_path)
 
-def main(output_file, keywords, max_results_per_keyword, quota_limit):
-    youtube = build(API_SERVICE_NAME, API_VERSION, developerKey=YOUTUBE_API_KEY)
-    new_videos = collect_videos(youtube, keywords, max_results_per_keyword, quota_limit)
+    new_videos = collect_videos(youtube, keywords, max_results_per_keyword, quota_limit, MAX_WORKERS, REQUESTS_PER_SECOND, known_ids, checkpoint,
+                                get_quota_ledger_path(output_file))
     save_to_csv(new_videos, output_file)
+    unfinished = [keyword for keyword in keywords if not checkpoint.get(keyword)['done']]
+    if unfinished:
+        # Stopped by the quota or an API error: keep the page tokens for --resume
+        print(f"{len(unfinished)} keywords not finished ({', '.join(unfinished)}). Run with --resume to continue.")
+    else:
+        # Everything collected is now in the catalog; a stale checkpoint would only re-add it
+        checkpoint.remove()
 
 if __name__ == "__main__":
     # Configuration section - Adjust these variables as needed
@@ -180,7 +621,12 @@ if __name__ == "__main__":
         "Commercial electrical construction",
     ]
     MAX_RESULTS_PER_KEYWORD = 3
-    QUOTA_LIMIT = 9900
+    QUOTA_LIMIT = 10000  # Daily quota in units (search.list = 100, videos.list = 1)
+    ESTIMATED_MATCH_RATE = 0.5  # Share of search hits expected to pass the title filter
+    PLAN_ONLY = '--plan' in sys.argv  # Print estimated quota usage per keyword and exit
+    RESUME = '--resume' in sys.argv  # Continue an interrupted crawl from its saved page tokens
+    MAX_WORKERS = 4  # Keywords searched concurrently
+    REQUESTS_PER_SECOND = 5  # Shared across all workers
     
     # Run the main function with the configured parameters
-    main(output_path, keywords, MAX_RESULTS_PER_KEYWORD, QUOTA_LIMIT)
\ No newline at end of file
+    main(output_path, keywords, MAX_RESULTS_PER_KEYWORD, QUOTA_LIMIT, RESUME)
\ No newline at end of file
@@ -1,97 +1,321 @@
 import csv
 import json
 import os
+import sys
+import importlib
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api._errors import TranscriptsDisabled, NoTranscriptAvailable
-from urllib.parse import urlparse, parse_qs
-
-def extract_video_id(url):
-    parsed_url = urlparse(url)
-    if parsed_url.hostname in ('youtu.be', 'www.youtu.be'):
-        return parsed_url.path[1:]
-    if parsed_url.hostname in ('youtube.com', 'www.youtube.com'):
-        if parsed_url.path == '/watch':
-            return parse_qs(parsed_url.query)['v'][0]
-        if parsed_url.path[:7] == '/embed/':
-            return parsed_url.path.split('/')[2]
-        if parsed_url.path[:3] == '/v/':
-            return parsed_url.path.split('/')[2]
-    return None
-
-def get_transcript(url):
-    video_id = extract_video_id(url)
+
+# Reuse the URL parsing and rate limiting helpers of the URL collection stage
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+download_url = importlib.import_module('01_download_URL')
+
+def build_segments(entries):
+    """Flatten transcript entries into one string plus columnar segment arrays.
+
+    `offset[i]` is where segment i's text starts in the flattened transcript, so segment
+    text is a slice of the string rather than a second copy of it.
+    """
+    texts = []
+    segments = {'start': [], 'duration': [], 'offset': []}
+    position = 0
+    for entry in entries:
+        segments['start'].append(round(entry['start'], 2))
+        segments['duration'].append(round(entry['duration'], 2))
+        segments['offset'].append(position)
+        texts.append(entry['text'])
+        position += len(entry['text']) + 1  # +1 for the joining space
+    return ' '.join(texts), segments
+
+def get_transcript(url, fetch_transcript=None):
+    """Download one transcript; `fetch_transcript` replaces YouTubeTranscriptApi.get_transcript (e.g. a stub).
+
+    Returns (transcript, segments, missing_reason). All are None for a transient failure worth retrying.
+    """
+    if fetch_transcript is None:
+        fetch_transcript = YouTubeTranscriptApi.get_transcript
+    video_id = download_url.extract_video_id(url)
     if not video_id:
         print(f"Could not extract video ID from URL: {url}")
-        return None
+        return None, None, 'InvalidURL'
     try:
-        transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=['en-US', 'en'])
-        full_transcript = ' '.join([entry['text'] for entry in transcript])
-        return full_transcript
-    except (TranscriptsDisabled, NoTranscriptAvailable):
+        transcript = fetch_transcript(video_id, languages=['en-US', 'en'])
+        full_transcript, segments = build_segments(transcript)
+        return full_transcript, segments, None
+    except (TranscriptsDisabled, NoTranscriptAvailable) as e:
         print(f"No transcript available for video ID: {video_id}")
-        return None
+        return None, None, type(e).__name__
     except Exception as e:
         print(f"Error getting transcript for video ID {video_id}: {str(e)}")
-        return None
+        return None, None, None
+
+def format_timestamp(seconds):
+    """Format seconds as MM:SS, or H:MM:SS for long videos (e.g. "see 04:32 in this video")"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+def text_between(record, start_seconds, end_seconds):
+    """Transcript text of the segments starting in [start_seconds, end_seconds), found in O(log n)"""
+    starts = record['Segments']['start']
+    offsets = record['Segments']['offset']
+    first = bisect_right(starts, start_seconds - 1e-9)
+    last = bisect_right(starts, end_seconds - 1e-9)
+    if first >= last:
+        return ''
+    end = offsets[last] - 1 if last < len(offsets) else len(record['Transcript'])
+    return record['Transcript'][offsets[first]:end]
+
+def chunk_by_time(record, window_seconds):
+    """Split a transcript into consecutive windows of `window_seconds`, each with its start timestamp"""
+    starts = record['Segments']['start']
+    if not starts:
+        return []
+    chunks = []
+    window_start = 0.0
+    last_start = starts[-1]
+    while window_start <= last_start:
+        text = text_between(record, window_start, window_start + window_seconds)
+        if text:
+            chunks.append({'start': window_start, 'timestamp': format_timestamp(window_start), 'text': text})
+        window_start += window_seconds
+    return chunks
+
+class TranscriptStore:
+    """Line-delimited transcript store (one JSON record per line) with a VideoID -> byte offset index.
+
+    Records are appended one at a time as downloads finish; the sidecar index lets
+    consumers seek straight to a single record instead of parsing the whole corpus.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.index_path = f"{os.path.splitext(path)[0]}_index.csv"
+        self.store_file = None
+        self.index_file = None
+
+    def open(self, mode='a'):
+        """Open for writing; mode 'w' starts an empty store, 'a' appends to the existing one"""
+        if mode == 'a' and os.path.exists(self.path):
+            self.truncate_partial_line()
+            if not os.path.exists(self.index_path):
+                self.rebuild_index()
+        self.store_file = open(self.path, mode + 'b')
+        self.index_file = open(self.index_path, mode, newline='', encoding='utf-8')
+        if self.index_file.tell() == 0:
+            csv.writer(self.index_file).writerow(['VideoID', 'Offset'])
+        return self
+
+    def close(self):
+        for file in (self.store_file, self.index_file):
+            if file is not None:
+                file.close()
+        self.store_file = self.index_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append(self, record):
+        offset = self.store_file.tell()
+        self.store_file.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.store_file.flush()
+        # Index after the record is on disk, so every indexed offset points at a complete line
+        csv.writer(self.index_file).writerow([record['VideoID'], offset])
+        self.index_file.flush()
+
+    def truncate_partial_line(self, block_size=65536):
+        """Cut a partial last line left by an interrupted write, so the next append starts a new line"""
+        with open(self.path, 'r+b') as storefile:
+            end = storefile.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - block_size)
+                storefile.seek(start)
+                newline = storefile.read(position - start).rfind(b'\n')
+                if newline != -1:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                print(f"Dropping {end - position} bytes of a partial record at the end of {self.path}")
+                storefile.truncate(position)
+
+    def rebuild_index(self):
+        with open(self.index_path, 'w', newline='', encoding='utf-8') as indexfile:
+            writer = csv.writer(indexfile)
+            writer.writerow(['VideoID', 'Offset'])
+            for offset, record in self.iter_with_offsets():
+                writer.writerow([record['VideoID'], offset])
+
+    def load_index(self):
+        if not os.path.exists(self.path):
+            return {}
+        if not os.path.exists(self.index_path):
+            self.rebuild_index()
+        with open(self.index_path, 'r', newline='', encoding='utf-8') as indexfile:
+            return {row['VideoID']: int(row['Offset']) for row in csv.DictReader(indexfile)}
+
+    def get(self, video_id, index=None):
+        offset = (index if index is not None else self.load_index()).get(str(video_id))
+        if offset is None:
+            return None
+        with open(self.path, 'rb') as storefile:
+            storefile.seek(offset)
+            return json.loads(storefile.readline())
+
+    def iter_with_offsets(self):
+        with open(self.path, 'rb') as storefile:
+            offset = 0
+            for line in storefile:
+                # Skip a partial last line left by an interrupted write
+                if line.endswith(b'\n'):
+                    yield offset, json.loads(line)
+                offset += len(line)
+
+    def iter_latest(self):
+        """Records as the index sees them: only the last one appended per VideoID"""
+        index = self.load_index()
+        for offset, record in self.iter_with_offsets():
+            if index.get(str(record['VideoID'])) == offset:
+                yield record
+
+    def __iter__(self):
+        for _, record in self.iter_with_offsets():
+            yield record
+
+def migrate_json_to_store(json_file, store_file):
+    """Convert a legacy transcripts.json array into a line-delimited TranscriptStore"""
+    with open(json_file, 'r', encoding='utf-8') as infile:
+        data = json.load(infile)
+    with TranscriptStore(store_file).open('w') as store:
+        for record in data:
+            store.append(record)
+    print(f"Migrated {len(data)} transcripts from {json_file} to {store_file}")
+
+class MissingTranscriptLog:
+    """Append-only log of videos known to have no transcript, each with a retry-after time"""
+    def __init__(self, store_path):
+        self.path = f"{os.path.splitext(store_path)[0]}_missing.csv"
+
+    def load(self):
+        """VideoID -> retry-after datetime; later entries override earlier ones"""
+        retry_after = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', newline='', encoding='utf-8') as logfile:
+                for row in csv.DictReader(logfile):
+                    retry_after[row['VideoID']] = datetime.fromisoformat(row['RetryAfter'])
+        return retry_after
+
+    def record(self, video_id, reason, retry_after):
+        file_exists = os.path.exists(self.path)
+        with open(self.path, 'a', newline='', encoding='utf-8') as logfile:
+            writer = csv.writer(logfile)
+            if not file_exists:
+                writer.writerow(['VideoID', 'Reason', 'RetryAfter'])
+            writer.writerow([video_id, reason, retry_after.isoformat()])
 
 def clean_column_name(name):
     return ''.join(char for char in name if char.isprintable()).strip()
 
-def process_csv_to_json(input_file, output_file):
+def process_csv_to_json(input_file, output_file, max_workers=8, requests_per_second=5, incremental=True, missing_retry_days=30, fetch_transcript=None):
+    """Download transcripts for the rows of `input_file` into the store at `output_file`.
+
+    In incremental mode the store is appended to, and rows already in it, or known to have
+    no transcript until their retry-after time, are not requested again. Otherwise the
+    store is rebuilt from scratch.
+    """
     print(f"Starting to process {input_file}")
     
     if not os.path.exists(input_file):
         print(f"Error: Input file {input_file} does not exist.")
         return
 
+    # Every transcript is fetched from youtube.com, whichever URL form the catalog holds
+    rate_limiter = download_url.TokenBucket(requests_per_second)
+
+    def download(row):
+        url = row['URL']
+        video_id = row['VideoID']
+        print(f"Processing VideoID: {video_id}")
+        rate_limiter.acquire()
+        return row, *get_transcript(url, fetch_transcript)
+
     try:
         with open(input_file, 'r', newline='', encoding='utf-8-sig') as infile:
             reader = csv.DictReader(infile)
             reader.fieldnames = [clean_column_name(field) for field in reader.fieldnames]
-            output_data = []
-            
-            for row in reader:
-                url = row['URL']
+            rows = list(reader)
+
+        store = TranscriptStore(output_file)
+        missing_log = MissingTranscriptLog(output_file)
+        if incremental:
+            now = datetime.now(timezone.utc)
+            downloaded_ids = store.load_index().keys()
+            retry_after = missing_log.load()
+            pending_rows = [
+                row for row in rows
+                if row['VideoID'] not in downloaded_ids and retry_after.get(row['VideoID'], now) <= now
+            ]
+            print(f"Incremental refresh: {len(rows) - len(pending_rows)} of {len(rows)} videos already downloaded or known missing")
+            rows = pending_rows
+
+        saved_count = 0
+        with store.open('a' if incremental else 'w'), ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # map() yields results in input order, whatever order the downloads finish in
+            for row, transcript, segments, missing_reason in executor.map(download, rows):
                 video_id = row['VideoID']
-                print(f"Processing VideoID: {video_id}")
-                
-                transcript = get_transcript(url)
-                
                 if transcript is not None:
                     output_row = {
                         'VideoID': video_id,
                         'Title': row['Title'],
-                        'URL': url,
+                        'URL': row['URL'],
                         'Keyword': row['Keyword'],
-                        'Transcript': transcript
+                        'Transcript': transcript,
+                        'Segments': segments
                     }
-                    output_data.append(output_row)
+                    store.append(output_row)
+                    saved_count += 1
                     print(f"Successfully extracted transcript for VideoID: {video_id}")
                 else:
+                    if missing_reason is not None:
+                        # Negative result: don't ask for this video again until the retry-after time
+                        missing_log.record(video_id, missing_reason, datetime.now(timezone.utc) + timedelta(days=missing_retry_days))
                     print(f"Skipping VideoID: {video_id} due to missing transcript")
 
-        with open(output_file, 'w', encoding='utf-8') as outfile:
-            json.dump(output_data, outfile, indent=2, ensure_ascii=False)
-
-        print(f"Processing complete. Results saved to {output_file}")
+        print(f"Processing complete. {saved_count} transcripts saved to {output_file}")
     except Exception as e:
         print(f"An error occurred while processing the file: {str(e)}")
 
-# File configuration
-script_dir = os.path.dirname(os.path.abspath(__file__))
+if __name__ == "__main__":
+    # File configuration
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    # For testing
+    input_file_name = 'video_URL_test.csv'
+    output_file_name = 'transcripts_test.jsonl'
+
+    # For deployment (uncomment these and comment out the test lines above when ready)
+    # input_file_name = 'video_URL.csv'
+    # output_file_name = 'transcripts.jsonl'
 
-# For testing
-input_file_name = 'video_URL_test.csv'
-output_file_name = 'transcripts_test.json'
+    input_path = os.path.join(script_dir, input_file_name)
+    output_path = os.path.join(script_dir, output_file_name)
 
-# For deployment (uncomment these and comment out the test lines above when ready)
-# input_file_name = 'video_URL.csv'
-# output_file_name = 'transcripts.json'
+    # Download settings
+    MAX_WORKERS = 8  # Transcripts downloaded concurrently
+    REQUESTS_PER_SECOND = 5  # To YouTube, shared across all workers
+    INCREMENTAL = True  # Only fetch new or previously failed videos; False rebuilds the store
+    MISSING_RETRY_DAYS = 30  # Days before a video without transcript is checked again
 
-input_path = os.path.join(script_dir, input_file_name)
-output_path = os.path.join(script_dir, output_file_name)
+    # One-off conversion of an existing transcripts.json array (uncomment if needed)
+    # migrate_json_to_store(os.path.join(script_dir, '04_transcripts.json'), os.path.join(script_dir, '04_transcripts.jsonl'))
 
-# Process the files
-process_csv_to_json(input_path, output_path)
+    # Process the files
+    process_csv_to_json(input_path, output_path, MAX_WORKERS, REQUESTS_PER_SECOND, INCREMENTAL, MISSING_RETRY_DAYS)
 
-print("Script execution completed.")
\ No newline at end of file
+    print("Script execution completed.")
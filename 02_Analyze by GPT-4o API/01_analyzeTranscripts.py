@@ -1,21 +1,55 @@
 import json
 import csv
+import re
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import os
-from typing import List, Dict
+import sys
+import threading
+import importlib
+import hashlib
+import sqlite3
+import random
+import struct
+import mmap
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Iterator
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-def analyze_transcript(transcript: str, api_key: str, model: str) -> str:
-    headers = {
-        'Authorization': f'Bearer {api_key}',
-        'Content-Type': 'application/json'
-    }
-    
-    prompt = f"""
+# Reuse the file helpers of the download stage
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '01_Download Transcript by Youtube API'))
+download_url = importlib.import_module('01_download_URL')
+
+CATEGORY_COLUMNS = {
+    'Electrical_Terms': 'Electrical Terms',
+    'Problems_Challenges': 'Problems/Challenges',
+    'Tools_Equipment': 'Tools/Equipment',
+    'Educational_Content': 'Educational Content',
+}
+# Failures a retry would only repeat (e.g. context length exceeded); not resubmitted automatically
+PERMANENT_ERROR_PREFIX = "Permanent Error:"
+CSV_HEADERS = ['VideoID', 'Title', 'URL'] + list(CATEGORY_COLUMNS.values())
+ANALYSIS_ERROR_PREFIXES = ("Error:", "Request Error:", "JSON Decode Error:", "Schema Error:", "Key Error:", "Unexpected Error:",
+                           PERMANENT_ERROR_PREFIX)
+# Rough budget for the fixed prompt text plus the completion, on top of the transcript itself
+PROMPT_OVERHEAD_TOKENS = 300
+COMPLETION_TOKEN_ALLOWANCE = 1000
+API_BASE_URL = 'https://api.openai.com/v1'
+# Rate limiting and server-side failures that are worth retrying; other 4xx errors are permanent
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+# Markdown code fence around a reply ("```json ... ```"), and a comma right before a closing bracket.
+# String literals are matched first so that commas inside them are left alone
+CODE_FENCE = re.compile(r'```(?:json)?\s*(.*?)```', re.DOTALL | re.IGNORECASE)
+TRAILING_COMMA = re.compile(r'("(?:[^"\\]|\\.)*")|,(\s*[}\]])', re.DOTALL)
+
+SYSTEM_PROMPT = "You are an expert in electrical construction analyzing video transcripts. Provide concise, structured analysis in the exact format specified."
+PROMPT_TEMPLATE = """
     Analyze the following transcript from an electrical construction video and provide insights in this exact structure:
 
     {{
@@ -53,39 +87,577 @@ def analyze_transcript(transcript: str, api_key: str, model: str) -> str:
 
     Provide your analysis strictly in the JSON-like structure specified above.
     """
-    
+
+def build_chat_request(transcript: str, model: str, json_mode: bool = False) -> Dict:
+    """Request body for one chat completion (shared by interactive and batch mode)"""
     data = {
         "model": model,
         "messages": [
-            {"role": "system", "content": "You are an expert in electrical construction analyzing video transcripts. Provide concise, structured analysis in the exact format specified."},
-            {"role": "user", "content": prompt}
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": PROMPT_TEMPLATE.format(transcript=transcript)}
         ]
     }
+    if json_mode:
+        # The model may then only emit a single JSON object (the prompt already asks for JSON)
+        data["response_format"] = {"type": "json_object"}
+    return data
+
+def repair_analysis(content: str) -> str:
+    """Recover the analysis object from a near-miss reply and check it against the four-key schema.
+
+    Handles the usual ways a reply misses strict JSON: code fences, text before or after the
+    object, and trailing commas. Raises json.JSONDecodeError if no object can be parsed and
+    ValueError if the object does not have the expected shape. Returns normalized JSON.
+    """
+    text = content.strip()
+    fence = CODE_FENCE.search(text)
+    if fence:
+        text = fence.group(1)
+    start = text.find('{')
+    if start == -1:
+        raise json.JSONDecodeError("No JSON object in reply", text, 0)
+    text = text[start:]
+    try:
+        analysis_dict, _ = json.JSONDecoder().raw_decode(text)  # Ignores anything after the object
+    except json.JSONDecodeError:
+        analysis_dict = json.loads(TRAILING_COMMA.sub(lambda match: match.group(1) or match.group(2),
+                                                      text[:text.rfind('}') + 1]))
+
+    if not isinstance(analysis_dict, dict):
+        raise ValueError(f"expected an object with keys {', '.join(CATEGORY_COLUMNS)}")
+    # A misspelled or missing category would otherwise be stored as a complete, empty one
+    unknown = [key for key in analysis_dict if key not in CATEGORY_COLUMNS]
+    if unknown:
+        raise ValueError(f"unexpected keys {', '.join(unknown)}")
+    missing = [key for key in CATEGORY_COLUMNS if key not in analysis_dict]
+    if missing:
+        raise ValueError(f"missing keys {', '.join(missing)}")
+    analysis = {}
+    for key in CATEGORY_COLUMNS:
+        items = analysis_dict[key]
+        if not isinstance(items, list):
+            raise ValueError(f"{key} is not a list")
+        analysis[key] = [item if isinstance(item, str) else json.dumps(item, ensure_ascii=False) for item in items]
+    return json.dumps(analysis, ensure_ascii=False)
+
+def extract_analysis(response_body: Dict) -> str:
+    """Pull the validated JSON analysis out of a chat completion response body"""
+    try:
+        message = response_body['choices'][0]['message']
+        if not isinstance(message['content'], str):
+            # A refusal comes back with content null (and the reason in 'refusal')
+            return f"Error: no analysis in reply ({message.get('refusal') or 'empty content'})"
+        return repair_analysis(message['content'])
+    except json.JSONDecodeError as e:
+        return f"JSON Decode Error: {str(e)}"
+    except ValueError as e:
+        return f"Schema Error: {str(e)}"
+    except (KeyError, IndexError, TypeError) as e:
+        return f"Key Error: {str(e)}"
+
+def parse_retry_after(response: requests.Response):
+    """Seconds to wait according to Retry-After (seconds or HTTP date) or retry-after-ms, or None"""
+    if response.headers.get('retry-after-ms'):
+        try:
+            return float(response.headers['retry-after-ms']) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class AnalysisClient:
+    """OpenAI API client owning one pooled keep-alive session, shared by all workers of a run.
+
+    Timeouts, connection errors, 429 and 5xx responses are retried with jittered exponential
+    backoff (or the server's Retry-After when given); any other response is returned as is.
+    """
+    def __init__(self, api_key: str, model: str, api_base_url: str = API_BASE_URL,
+                 pool_size: int = 8, connect_timeout: float = 10, read_timeout: float = 120,
+                 max_retries: int = 5, backoff_base: float = 1, backoff_max: float = 60):
+        self.model = model
+        self.api_base_url = api_base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        # Content-Type is left to requests (json= / files=), so multipart uploads keep theirs
+        self.session.headers.update({'Authorization': f'Bearer {api_key}'})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def backoff_delay(self, attempt: int, retry_after=None) -> float:
+        # Full jitter keeps workers that failed together from retrying in lockstep
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        url = f'{self.api_base_url}{path}'
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                print(f"{method} {path} failed ({type(e).__name__}). Retrying in {delay:.1f}s.")
+            else:
+                if response.status_code not in TRANSIENT_STATUS_CODES or attempt == self.max_retries:
+                    return response
+                delay = self.backoff_delay(attempt, parse_retry_after(response))
+                print(f"{method} {path} returned {response.status_code}. Retrying in {delay:.1f}s.")
+            time.sleep(delay)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request('POST', path, **kwargs)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request('GET', path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+def http_failure(status_code: int, detail) -> str:
+    """Error string for a failed request; 4xx responses other than rate limiting are permanent"""
+    if 400 <= status_code < 500 and status_code not in TRANSIENT_STATUS_CODES:
+        return f"{PERMANENT_ERROR_PREFIX} {status_code} {detail}"
+    return f"Error: {status_code} {detail}"
+
+def failure_kind(analysis: str) -> str:
+    return 'permanent' if analysis.startswith(PERMANENT_ERROR_PREFIX) else 'transient'
+
+def analyze_transcript(transcript: str, client: AnalysisClient, json_mode: bool = False) -> str:
+    data = build_chat_request(transcript, client.model, json_mode)
     
     try:
-        response = requests.post('https://api.openai.com/v1/chat/completions', headers=headers, json=data)
-        response.raise_for_status()
+        response = client.post('/chat/completions', json=data)
         
         if response.status_code == 200:
-            content = response.json()['choices'][0]['message']['content'].strip()
-            json.loads(content)  # Validate JSON
-            return content
+            return extract_analysis(response.json())
         else:
-            return f"Error: Unexpected status code {response.status_code}"
+            # Transient statuses only get here once the client's retries are used up
+            return http_failure(response.status_code, response.text[:500])
     except requests.exceptions.RequestException as e:
         return f"Request Error: {str(e)}"
     except json.JSONDecodeError as e:
         return f"JSON Decode Error: {str(e)}"
-    except KeyError as e:
-        return f"Key Error: {str(e)}"
     except Exception as e:
         return f"Unexpected Error: {str(e)}"
 
-def process_videos(start_id: int, end_id: int, input_file: str, output_file: str, api_key: str, model: str, min_transcript_words: int):
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    input_file = os.path.join(script_dir, input_file)
-    output_file = os.path.join(script_dir, output_file)
-    
+class ResponseCache:
+    """On-disk LRU cache of finished analyses, keyed by a hash of everything that shapes them.
+
+    Entries are the validated JSON analysis of one request (one chunk of a transcript), not raw
+    completions. The key covers model, system prompt, prompt template, JSON mode and the chunk
+    text, so every paid chunk is reused even when another chunk of the same video failed, and
+    changing any of them causes new calls.
+    """
+    def __init__(self, path: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # One connection shared by the worker threads, serialized by self.lock; the timeout
+        # covers other processes (shards) holding the database lock
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                completion TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )""")
+        self.connection.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+        self.connection.commit()
+        self.total_bytes = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        self.evict()  # In case max_bytes was lowered since the last run
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, chunk: str, json_mode: bool) -> str:
+        digest = hashlib.sha256()
+        for part in (model, SYSTEM_PROMPT, PROMPT_TEMPLATE, str(bool(json_mode)), chunk):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')  # Separator, so ("ab", "c") and ("a", "bc") differ
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        with self.lock:
+            row = self.connection.execute('SELECT completion FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.connection.execute('UPDATE responses SET last_access = ? WHERE key = ?', (time.time(), key))
+            self.connection.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, analysis: str):
+        size = len(analysis.encode('utf-8'))
+        with self.lock:
+            old = self.connection.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self.connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)', (key, analysis, size, time.time()))
+            self.total_bytes += size - (old[0] if old else 0)
+            self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        """Drop least recently used entries until back under the size limit"""
+        while self.total_bytes > self.max_bytes:
+            victim = self.connection.execute('SELECT key, size FROM responses ORDER BY last_access LIMIT 1').fetchone()
+            if victim is None:
+                break
+            self.connection.execute('DELETE FROM responses WHERE key = ?', (victim[0],))
+            self.total_bytes -= victim[1]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+def chunk_transcript(transcript: str, max_tokens: int, overlap_tokens: int) -> List[str]:
+    """Split a transcript on word boundaries into chunks of about `max_tokens`, each
+    repeating the last `overlap_tokens` of the previous one so no point is cut in half"""
+    if estimate_tokens(transcript) <= max_tokens:
+        return [transcript]
+    words = transcript.split()
+    max_chars = max_tokens * 4
+    overlap_chars = overlap_tokens * 4
+    chunks = []
+    start = 0
+    while start < len(words):
+        end = start
+        length = 0
+        while end < len(words) and (length + len(words[end]) + 1 <= max_chars or end == start):
+            length += len(words[end]) + 1
+            end += 1
+        chunks.append(' '.join(words[start:end]))
+        if end == len(words):
+            break
+        # Step back over roughly overlap_chars worth of words, always moving forward overall
+        next_start = end
+        overlap = 0
+        while next_start > start + 1 and overlap + len(words[next_start - 1]) + 1 <= overlap_chars:
+            next_start -= 1
+            overlap += len(words[next_start]) + 1
+        start = next_start
+    return chunks
+
+def merge_analyses(analyses: List[str]) -> str:
+    """Reduce per-chunk analyses into one, deduplicating items case-insensitively in first-seen order"""
+    errors = [analysis for analysis in analyses if analysis.startswith(ANALYSIS_ERROR_PREFIXES)]
+    if errors:
+        # Partial results would be stored as if complete; a permanent failure decides the video's kind
+        return next((error for error in errors if failure_kind(error) == 'permanent'), errors[0])
+    if len(analyses) == 1:
+        return analyses[0]
+    merged = {key: [] for key in CATEGORY_COLUMNS}
+    seen = {key: set() for key in CATEGORY_COLUMNS}
+    for analysis in analyses:
+        analysis_dict = json.loads(analysis)
+        for key in CATEGORY_COLUMNS:
+            for item in analysis_dict.get(key, []):
+                normalized = ' '.join(item.split()).casefold()
+                if normalized not in seen[key]:
+                    seen[key].add(normalized)
+                    merged[key].append(item)
+    return json.dumps(merged, ensure_ascii=False)
+
+class ResultStore:
+    """SQLite store of analysis results with one row per (VideoID, category, item).
+
+    Items are stored as written by the model, so nothing is lost to comma splitting, and
+    downstream explode/aggregate steps become indexed queries. Writes are buffered and
+    committed `batch_size` videos per transaction.
+    """
+    def __init__(self, path: str, batch_size: int = 50):
+        self.batch_size = batch_size
+        self.pending = []
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id INTEGER PRIMARY KEY,
+                title TEXT,
+                url TEXT,
+                status TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                video_id INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                item TEXT NOT NULL,
+                PRIMARY KEY (video_id, category, position)
+            );
+            CREATE INDEX IF NOT EXISTS items_category ON items (category, video_id);
+        """)
+
+    def add(self, video_id: int, title: str, url: str, analysis: str = None, status: str = None):
+        """Queue one video's result; `status` marks videos without analysis (e.g. 'short')"""
+        items = []
+        if status is None:
+            if analysis.startswith(ANALYSIS_ERROR_PREFIXES):
+                status = 'error'
+            else:
+                status = 'ok'
+                analysis_dict = json.loads(analysis)
+                for category in CATEGORY_COLUMNS:
+                    for position, item in enumerate(analysis_dict.get(category, [])):
+                        items.append((video_id, category, position, item))
+        self.pending.append(((video_id, title, url, status), items))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        with self.connection:  # One transaction for the whole batch
+            for video, items in self.pending:
+                # A re-analysis (e.g. retry of an earlier failure) replaces the old result
+                self.connection.execute('DELETE FROM items WHERE video_id = ?', (video[0],))
+                self.connection.execute('INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?)', video)
+                self.connection.executemany('INSERT INTO items VALUES (?, ?, ?, ?)', items)
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+def batch_custom_id(video_id: int, chunk_index: int = 0) -> str:
+    return f"video-{video_id}-{chunk_index}"
+
+def submit_batch(batch_file: str, client: AnalysisClient) -> str:
+    """Upload a JSONL batch input file and start a batch job; returns the batch ID"""
+    with open(batch_file, 'rb') as file:
+        # Read into memory so a retried upload sends the whole file again
+        response = client.post('/files', files={'file': (os.path.basename(batch_file), file.read())}, data={'purpose': 'batch'})
+    response.raise_for_status()
+    input_file_id = response.json()['id']
+
+    response = client.post('/batches', json={
+        'input_file_id': input_file_id,
+        'endpoint': '/v1/chat/completions',
+        'completion_window': '24h'
+    })
+    response.raise_for_status()
+    return response.json()['id']
+
+def wait_for_batch(batch_id: str, client: AnalysisClient, poll_interval: float = 60) -> Dict:
+    """Poll a batch job until it reaches a final status; returns the batch object"""
+    while True:
+        response = client.get(f'/batches/{batch_id}')
+        response.raise_for_status()
+        batch = response.json()
+        if batch['status'] in ('completed', 'failed', 'expired', 'cancelled'):
+            return batch
+        counts = batch.get('request_counts', {})
+        print(f"Batch {batch_id} is {batch['status']} ({counts.get('completed', 0)}/{counts.get('total', '?')} done). Checking again in {poll_interval}s.")
+        time.sleep(poll_interval)
+
+def download_batch_results(batch: Dict, client: AnalysisClient) -> Dict[int, Dict[int, str]]:
+    """Map VideoID -> chunk index -> analysis (or error string) from a finished batch's output and error files"""
+    results = {}
+    for file_key in ('output_file_id', 'error_file_id'):
+        if not batch.get(file_key):
+            continue
+        response = client.get(f'/files/{batch[file_key]}/content')
+        response.raise_for_status()
+        for line in response.text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                result = json.loads(line)
+                _, video_id, chunk_index = result['custom_id'].split('-')
+                video_id, chunk_index = int(video_id), int(chunk_index)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                # Not attributable to a video; its chunk is reported missing by the merge step
+                print(f"Skipping unreadable line in batch {file_key}: {str(e)}")
+                continue
+            try:
+                response_data = result.get('response') or {}
+                if result.get('error'):
+                    analysis = f"Error: {result['error']}"
+                elif response_data.get('status_code') != 200:
+                    analysis = http_failure(response_data.get('status_code') or 0, json.dumps(response_data.get('body')))
+                else:
+                    analysis = extract_analysis(response_data['body'])
+            except Exception as e:
+                analysis = f"Unexpected Error: {str(e)}"
+            results.setdefault(video_id, {})[chunk_index] = analysis
+    return results
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+class RateLimiter:
+    """Thread-safe requests-per-minute and tokens-per-minute limits shared by all workers"""
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.request_rate = requests_per_minute / 60
+        self.token_rate = tokens_per_minute / 60
+        self.request_capacity = requests_per_minute
+        self.token_capacity = tokens_per_minute
+        self.requests = float(requests_per_minute)
+        self.tokens = float(tokens_per_minute)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: int):
+        # A single oversized request must still be able to run once the bucket is full
+        tokens = min(tokens, self.token_capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                elapsed = now - self.last_refill
+                self.requests = min(self.request_capacity, self.requests + elapsed * self.request_rate)
+                self.tokens = min(self.token_capacity, self.tokens + elapsed * self.token_rate)
+                self.last_refill = now
+                if self.requests >= 1 and self.tokens >= tokens:
+                    self.requests -= 1
+                    self.tokens -= tokens
+                    return
+                wait_time = max((1 - self.requests) / self.request_rate, (tokens - self.tokens) / self.token_rate)
+            time.sleep(wait_time)
+
+def placeholder_row(video_id: int, title: str, url: str, text: str) -> Dict:
+    row = {'VideoID': video_id, 'Title': title, 'URL': url}
+    for column in CATEGORY_COLUMNS.values():
+        row[column] = text
+    return row
+
+def analysis_row(video_id: int, title: str, url: str, analysis: str) -> Dict:
+    analysis_dict = json.loads(analysis)
+    row = {'VideoID': video_id, 'Title': title, 'URL': url}
+    for key, column in CATEGORY_COLUMNS.items():
+        row[column] = ', '.join(analysis_dict.get(key, []))
+    print(f"Analysis complete for video: {video_id}")
+    return row
+
+class FailureLog:
+    """Append-only log of failed analyses, kept out of the output CSV so that a video retried
+    successfully later has exactly one row there.
+
+    Each row records whether the failure was transient (retried by the next run) or
+    permanent (skipped by later runs unless permanent failures are retried explicitly).
+    """
+    fieldnames = ['VideoID', 'Title', 'URL', 'Error', 'Kind']
+
+    def __init__(self, output_file: str):
+        self.path = f"{os.path.splitext(output_file)[0]}_errors.csv"
+
+    def load(self) -> List[Dict]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'r', newline='', encoding='utf-8') as logfile:
+            # Logs written before failures had a kind only contain transient ones
+            return [dict(row, Kind=row.get('Kind') or 'transient') for row in csv.DictReader(logfile)]
+
+    def permanent_ids(self) -> set:
+        """VideoIDs whose latest failure is permanent"""
+        kinds = {int(row['VideoID']): row['Kind'] for row in self.load() if row['VideoID'].isdigit()}
+        return {video_id for video_id, kind in kinds.items() if kind == 'permanent'}
+
+    def extend(self, rows: List[Dict]):
+        file_exists = os.path.exists(self.path)
+        if file_exists:
+            with open(self.path, 'r', newline='', encoding='utf-8') as logfile:
+                if next(csv.reader(logfile), None) != self.fieldnames:
+                    # Older header: rewrite once so appended rows line up with their columns
+                    rows = self.load() + rows
+                    file_exists = False
+        with open(self.path, 'a' if file_exists else 'w', newline='', encoding='utf-8') as logfile:
+            writer = csv.DictWriter(logfile, fieldnames=self.fieldnames)
+            if not file_exists:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def record(self, video_id: int, title: str, url: str, error: str):
+        self.extend([{'VideoID': video_id, 'Title': title, 'URL': url, 'Error': error, 'Kind': failure_kind(error)}])
+
+def load_transcript_index(input_file: str) -> Dict[int, int]:
+    """Read the VideoID -> byte offset index written next to a .jsonl transcript store"""
+    index_file = f"{os.path.splitext(input_file)[0]}_index.csv"
+    offsets = {}
+    if os.path.exists(index_file):
+        with open(index_file, 'r', newline='', encoding='utf-8') as indexfile:
+            for row in csv.DictReader(indexfile):
+                offsets[int(row['VideoID'])] = int(row['Offset'])
+    else:
+        # No index yet: one streaming pass over the store recovers the offsets
+        with open(input_file, 'rb') as storefile:
+            offset = 0
+            for line in storefile:
+                if line.endswith(b'\n'):
+                    offsets[int(json.loads(line)['VideoID'])] = offset
+                offset += len(line)
+    return offsets
+
+# Sorted binary transcript index: fixed-width (VideoID, byte offset) records, binary-searchable in place
+SORTED_INDEX_RECORD = struct.Struct('<IQ')
+
+def get_sorted_index_path(input_file: str) -> str:
+    return f"{os.path.splitext(input_file)[0]}_index.bin"
+
+def build_sorted_index(input_file: str) -> str:
+    """(Re)build the sorted binary index if it is missing or older than the store; returns its path"""
+    sorted_index_file = get_sorted_index_path(input_file)
+    if os.path.exists(sorted_index_file) and os.path.getmtime(sorted_index_file) >= os.path.getmtime(input_file):
+        return sorted_index_file
+    offsets = load_transcript_index(input_file)
+    # A process reading the old index (another shard) never sees a half-written one
+    with download_url.atomic_write(sorted_index_file, 'wb') as indexfile:
+        for video_id in sorted(offsets):
+            indexfile.write(SORTED_INDEX_RECORD.pack(video_id, offsets[video_id]))
+    print(f"Built sorted transcript index {sorted_index_file} ({len(offsets)} videos)")
+    return sorted_index_file
+
+def lookup_offsets(sorted_index_file: str, start_id: int, end_id: int) -> List[tuple]:
+    """(VideoID, offset) pairs for start_id <= VideoID <= end_id, by binary search: O(log n + range)"""
+    if os.path.getsize(sorted_index_file) == 0:
+        return []
+    size = SORTED_INDEX_RECORD.size
+    with open(sorted_index_file, 'rb') as indexfile, mmap.mmap(indexfile.fileno(), 0, access=mmap.ACCESS_READ) as index:
+        count = len(index) // size
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if SORTED_INDEX_RECORD.unpack_from(index, middle * size)[0] < start_id:
+                low = middle + 1
+            else:
+                high = middle
+        entries = []
+        for position in range(low, count):
+            video_id, offset = SORTED_INDEX_RECORD.unpack_from(index, position * size)
+            if video_id > end_id:
+                break
+            entries.append((video_id, offset))
+    return entries
+
+def iter_transcripts(input_file: str, start_id: int, end_id: int, exclude_ids: set = frozenset()) -> Iterator[Dict]:
+    """Yield transcripts with start_id <= VideoID <= end_id, except those in `exclude_ids`.
+
+    For a .jsonl store only the records in range are read, found by binary search in the
+    sorted index and then by seeking to their offsets; a legacy .json array has to be
+    loaded in full.
+    """
+    if input_file.endswith('.jsonl'):
+        entries = lookup_offsets(build_sorted_index(input_file), start_id, end_id)
+        # Read in file order so the seeks move forward through the store
+        wanted = sorted(offset for video_id, offset in entries if video_id not in exclude_ids)
+        with open(input_file, 'rb') as storefile:
+            for offset in wanted:
+                storefile.seek(offset)
+                yield json.loads(storefile.readline())
+        return
+
     try:
         with open(input_file, 'r', encoding='utf-8') as file:
             data = json.load(file)
@@ -93,108 +665,508 @@ def process_videos(start_id: int, end_id: int, input_file: str, output_file: str
         print(f"UTF-8 decoding failed for {input_file}. Trying with ISO-8859-1 encoding...")
         with open(input_file, 'r', encoding='iso-8859-1') as file:
             data = json.load(file)
+    for video in data:
+        if start_id <= int(video['VideoID']) <= end_id and int(video['VideoID']) not in exclude_ids:
+            yield video
+
+class ProgressBitmap:
+    """Sidecar bitmap of analyzed VideoIDs (bit i set = video i done), so resuming a range
+    reads only that range's bytes instead of scanning the whole output CSV"""
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
 
-    csv_headers = ['VideoID', 'Title', 'URL', 'Electrical Terms', 'Problems/Challenges', 'Tools/Equipment', 'Educational Content']
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
 
-    processed_video_ids = set()
+    def load_range(self, start_id: int, end_id: int) -> set:
+        if not self.exists():
+            return set()
+        start_id = max(start_id, 0)
+        with open(self.path, 'rb') as bitmapfile:
+            bitmapfile.seek(start_id // 8)
+            data = bitmapfile.read(end_id // 8 - start_id // 8 + 1)
+        base = (start_id // 8) * 8
+        return {base + i * 8 + bit for i, byte in enumerate(data) for bit in range(8)
+                if byte >> bit & 1 and start_id <= base + i * 8 + bit <= end_id}
+
+    def mark(self, video_id: int):
+        if self.file is None:
+            self.file = open(self.path, 'r+b' if self.exists() else 'w+b')
+        byte_index = video_id // 8
+        self.file.seek(0, os.SEEK_END)
+        if self.file.tell() <= byte_index:
+            self.file.write(bytes(byte_index + 1 - self.file.tell()))
+        self.file.seek(byte_index)
+        current = self.file.read(1)[0]
+        self.file.seek(byte_index)
+        self.file.write(bytes([current | 1 << (video_id % 8)]))
+        self.file.flush()
+
+    def rebuild(self, video_ids: set):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        data = bytearray(max(video_ids, default=-1) // 8 + 1)
+        for video_id in video_ids:
+            data[video_id // 8] |= 1 << (video_id % 8)
+        with open(self.path, 'wb') as bitmapfile:
+            bitmapfile.write(data)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def sync_progress(output_file: str, progress: ProgressBitmap, failures: FailureLog):
+    """Bring the progress bitmap in line with the output CSV it describes.
+
+    An output CSV written before the bitmap existed is migrated once: its successful rows
+    are marked done, and its failed rows move to the failure log so that the retry does
+    not leave a second row for the same video. A bitmap without output is cleared.
+    """
     file_exists = os.path.isfile(output_file)
-    if file_exists:
+    if file_exists and not progress.exists():
         with open(output_file, 'r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            processed_video_ids = set(int(row['VideoID']) for row in reader if row['VideoID'].isdigit())
+            rows = [row for row in csv.DictReader(csvfile) if row['VideoID'].isdigit()]
+        failed = [row for row in rows if row['Electrical Terms'] == 'Error in analysis']
+        if failed:
+            failures.extend([{'VideoID': row['VideoID'], 'Title': row['Title'], 'URL': row['URL'], 'Error': 'Error in analysis',
+                              'Kind': 'transient'}
+                             for row in failed])
+            with download_url.atomic_write(output_file, newline='', encoding='utf-8') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=CSV_HEADERS)
+                writer.writeheader()
+                writer.writerows(row for row in rows if row['Electrical Terms'] != 'Error in analysis')
+        progress.rebuild(set(int(row['VideoID']) for row in rows if row['Electrical Terms'] != 'Error in analysis'))
+    elif not file_exists and progress.exists():
+        progress.rebuild(set())  # Output was deleted, so its progress no longer applies
 
-    mode = 'a' if file_exists else 'w'
-    with open(output_file, mode, newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=csv_headers)
-        
+class ResultWriter:
+    """Records finished videos: successes in the output CSV, failures in the FailureLog, both in
+    the ResultStore (if any), and marks done videos in the progress bitmap.
+
+    With a ResultStore, CSV rows wait for the store to commit their batch, so a hard kill
+    leaves neither an uncommitted video's row in the CSV nor a duplicate row after its retry.
+    """
+    def __init__(self, output_file: str, progress: ProgressBitmap, failures: FailureLog, store: ResultStore = None):
+        file_exists = os.path.isfile(output_file)
+        self.csvfile = open(output_file, 'a' if file_exists else 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.csvfile, fieldnames=CSV_HEADERS)
         if not file_exists:
-            writer.writeheader()
+            self.writer.writeheader()
+        self.progress = progress
+        self.failures = failures
+        self.store = store
+        self.pending_rows = []  # (VideoID, CSV row) of done videos whose ResultStore rows are not committed yet
+        self.processed = 0
+
+    def finish(self, video_id: int, row: Dict = None):
+        """Queue a done video's CSV row, and write the queue once the ResultStore has committed it"""
+        if row is not None:
+            self.pending_rows.append((video_id, row))
+        if self.store is None or not self.store.pending:  # Store empty = its last batch was just committed
+            self.write_pending()
+
+    def write_pending(self):
+        """Write the queued rows, and only once they are on disk mark their videos done"""
+        self.writer.writerows(row for _, row in self.pending_rows)
+        self.csvfile.flush()
+        for video_id, _ in self.pending_rows:
+            self.progress.mark(video_id)
+        self.pending_rows.clear()
+
+    def record(self, video_id: int, title: str, url: str, analysis: str):
+        failed = analysis.startswith(ANALYSIS_ERROR_PREFIXES)
+        if failed:
+            print(f"Error analyzing video {video_id}: {analysis}")
+            self.failures.record(video_id, title, url, analysis)
+        if self.store is not None:
+            self.store.add(video_id, title, url, analysis)
+        self.finish(video_id, None if failed else analysis_row(video_id, title, url, analysis))
+        self.processed += 1
+
+    def record_short(self, video_id: int, title: str, url: str):
+        if self.store is not None:
+            self.store.add(video_id, title, url, status='short')
+        self.finish(video_id, placeholder_row(video_id, title, url, 'N/A - Short/No Transcript'))
+        self.processed += 1
+
+    def close(self):
+        # Also runs on Ctrl-C or an error, so buffered ResultStore rows are committed and
+        # their CSV rows written instead of being lost
+        if self.store is not None:
+            self.store.close()
+        self.write_pending()
+        self.csvfile.close()
+        self.progress.close()
+
+class Analyzer:
+    """Turns transcripts into validated analyses: chunking, rate limits, the response cache and the API client"""
+    def __init__(self, client: AnalysisClient, rate_limiter: RateLimiter, cache: ResponseCache = None,
+                 chunk_max_tokens: int = 12000, chunk_overlap_tokens: int = 300, json_mode: bool = True, max_workers: int = 8):
+        self.client = client
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.chunk_max_tokens = chunk_max_tokens
+        self.chunk_overlap_tokens = chunk_overlap_tokens
+        self.json_mode = json_mode
+        # Chunks get their own pool: waiting on them from a video worker in the same pool could deadlock
+        self.chunk_executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def chunks(self, transcript: str) -> List[str]:
+        return chunk_transcript(transcript, self.chunk_max_tokens, self.chunk_overlap_tokens)
+
+    def cache_key(self, chunk: str) -> str:
+        return ResponseCache.make_key(self.client.model, chunk, self.json_mode)
+
+    def cached_chunks(self, chunks: List[str]) -> Dict[int, str]:
+        """Chunk index -> cached analysis, for the chunks answered by an earlier run"""
+        if self.cache is None:
+            return {}
+        cached = {}
+        for chunk_index, chunk in enumerate(chunks):
+            analysis = self.cache.get(self.cache_key(chunk))
+            if analysis is not None:
+                cached[chunk_index] = analysis
+        return cached
+
+    def remember(self, chunk: str, analysis: str):
+        if self.cache is not None and not analysis.startswith(ANALYSIS_ERROR_PREFIXES):
+            self.cache.put(self.cache_key(chunk), analysis)
+
+    def analyze_chunk(self, chunk: str) -> str:
+        self.rate_limiter.acquire(estimate_tokens(chunk) + PROMPT_OVERHEAD_TOKENS + COMPLETION_TOKEN_ALLOWANCE)
+        analysis = analyze_transcript(chunk, self.client, self.json_mode)
+        self.remember(chunk, analysis)
+        return analysis
+
+    def analyze_video(self, video: Dict) -> tuple:
+        """Chunks of a long transcript are analyzed in parallel and merged, so latency stays about one chunk's worth"""
+        video_id = int(video['VideoID'])
+        chunks, cached = video['Chunks'], video['CachedChunks']
+        missing = [chunk_index for chunk_index in range(len(chunks)) if chunk_index not in cached]
+        if len(missing) > 1:
+            print(f"Video {video_id} split into {len(chunks)} chunks, {len(missing)} to analyze")
+        analyses = dict(cached)
+        analyses.update(zip(missing, self.chunk_executor.map(self.analyze_chunk, [chunks[i] for i in missing])))
+        analysis = merge_analyses([analyses[i] for i in range(len(chunks))])
+        return video_id, video['Title'], video['URL'], analysis
+
+    def batch_request(self, chunk: str) -> Dict:
+        return build_chat_request(chunk, self.client.model, self.json_mode)
+
+    def close(self):
+        self.chunk_executor.shutdown()
+
+def videos_to_analyze(videos: Iterator[Dict], results: ResultWriter, analyzer: Analyzer, min_transcript_words: int) -> Iterator[Dict]:
+    """Record short and fully cached videos right away; yield the ones that need the API.
+
+    Yielded videos carry their `Chunks` and the `CachedChunks` already answered, so only the
+    rest are requested.
+    """
+    for video in videos:
+        video_id = int(video['VideoID'])
+        print(f"Processing video: {video_id}")
+        if len(video['Transcript'].split()) < min_transcript_words:
+            print(f"Video {video_id} has very short or no transcript. Skipping analysis.")
+            results.record_short(video_id, video['Title'], video['URL'])
+            continue
+        video['Chunks'] = analyzer.chunks(video['Transcript'])
+        video['CachedChunks'] = analyzer.cached_chunks(video['Chunks'])
+        if len(video['CachedChunks']) == len(video['Chunks']):
+            analysis = merge_analyses([video['CachedChunks'][i] for i in range(len(video['Chunks']))])
+            results.record(video_id, video['Title'], video['URL'], analysis)
+            continue
+        yield video
+
+def analyze_interactive(videos: Iterator[Dict], analyzer: Analyzer, results: ResultWriter, max_workers: int):
+    """Analyze videos with up to `max_workers` in flight, recording each as soon as it completes"""
+    in_flight = {}
 
-        videos_processed = 0
-        videos_skipped = 0
-        last_request_time = 0
-        min_request_interval = 0.1
+    def record_completed(done):
+        for future in done:
+            video_id = in_flight.pop(future)
+            try:
+                results.record(*future.result())
+            except Exception as e:
+                print(f"Error processing video {video_id}: {str(e)}")
 
-        for video in data:
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for video in videos:
+            # Keep at most two batches of work queued so transcripts are not all held in memory
+            if len(in_flight) >= 2 * max_workers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                record_completed(done)
+            in_flight[executor.submit(analyzer.analyze_video, video)] = int(video['VideoID'])
+        record_completed(list(in_flight))
+
+def analyze_batch(videos: Iterator[Dict], analyzer: Analyzer, results: ResultWriter, output_file: str, poll_interval: float):
+    """Analyze videos as one Batch API job: write its JSONL input, submit it, poll until it
+    finishes and record the merged results by VideoID.
+
+    The batch ID is kept in a sidecar file, so rerunning after an interruption resumes
+    polling the same job instead of submitting (and paying for) a new one.
+    """
+    batch_file = f"{os.path.splitext(output_file)[0]}_batch_input.jsonl"
+    batch_state_file = f"{os.path.splitext(output_file)[0]}_batch.json"
+    batch_videos = {}
+    # Only the request lines of uncached chunks go to disk; titles, URLs and cached chunk
+    # results are kept for the merge step (and chunk texts, to cache what the batch returns)
+    with open(batch_file, 'w', encoding='utf-8') as batchfile:
+        for video in videos:
             video_id = int(video['VideoID'])
-            if start_id <= video_id <= end_id:
-                if video_id in processed_video_ids:
-                    print(f"Video {video_id} already processed. Skipping.")
-                    videos_skipped += 1
+            chunks, cached = video['Chunks'], video['CachedChunks']
+            requested = {}
+            for chunk_index, chunk in enumerate(chunks):
+                if chunk_index in cached:
                     continue
+                batchfile.write(json.dumps({
+                    'custom_id': batch_custom_id(video_id, chunk_index),
+                    'method': 'POST',
+                    'url': '/v1/chat/completions',
+                    'body': analyzer.batch_request(chunk)
+                }, ensure_ascii=False) + '\n')
+                requested[chunk_index] = chunk if analyzer.cache is not None else None
+            batch_videos[video_id] = (video['Title'], video['URL'], len(chunks), cached, requested)
+    if not batch_videos:
+        os.remove(batch_file)
+        return
 
-                title = video['Title']
-                url = video['URL']
-                transcript = video['Transcript']
-
-                print(f"Processing video: {video_id}")
-
-                if len(transcript.split()) < min_transcript_words:
-                    print(f"Video {video_id} has very short or no transcript. Skipping analysis.")
-                    writer.writerow({
-                        'VideoID': video_id,
-                        'Title': title,
-                        'URL': url,
-                        'Electrical Terms': 'N/A - Short/No Transcript',
-                        'Problems/Challenges': 'N/A - Short/No Transcript',
-                        'Tools/Equipment': 'N/A - Short/No Transcript',
-                        'Educational Content': 'N/A - Short/No Transcript'
-                    })
-                    videos_processed += 1
-                    continue
+    if os.path.exists(batch_state_file):
+        with open(batch_state_file, 'r', encoding='utf-8') as statefile:
+            batch_id = json.load(statefile)['batch_id']
+        print(f"Resuming batch {batch_id}")
+    else:
+        batch_id = submit_batch(batch_file, analyzer.client)
+        with download_url.atomic_write(batch_state_file, encoding='utf-8') as statefile:
+            json.dump({'batch_id': batch_id}, statefile)
+        print(f"Submitted batch {batch_id} for {len(batch_videos)} videos")
+
+    batch = wait_for_batch(batch_id, analyzer.client, poll_interval)
+    chunk_results_by_video = download_batch_results(batch, analyzer.client)
+    missing = f"Error: no result in batch {batch_id} ({batch['status']})"
+    for video_id in sorted(batch_videos):
+        title, url, chunk_count, cached, requested = batch_videos[video_id]
+        chunk_results = chunk_results_by_video.get(video_id, {})
+        try:
+            for chunk_index, chunk in requested.items():
+                if chunk is not None and chunk_index in chunk_results:
+                    analyzer.remember(chunk, chunk_results[chunk_index])
+            analyses = [cached[i] if i in cached else chunk_results.get(i, missing) for i in range(chunk_count)]
+            results.record(video_id, title, url, merge_analyses(analyses))
+        except Exception as e:
+            print(f"Error processing video {video_id}: {str(e)}")
+    os.remove(batch_state_file)
+
+def process_videos(start_id: int, end_id: int, input_file: str, output_file: str, api_key: str, model: str, min_transcript_words: int,
+                   max_workers: int = 8, requests_per_minute: int = 500, tokens_per_minute: int = 200000,
+                   use_batch_api: bool = False, api_base_url: str = API_BASE_URL, poll_interval: float = 60,
+                   connect_timeout: float = 10, read_timeout: float = 120,
+                   cache_file: str = None, cache_max_bytes: int = 512 * 1024 * 1024,
+                   chunk_max_tokens: int = 12000, chunk_overlap_tokens: int = 300,
+                   max_retries: int = 5, backoff_base: float = 1, backoff_max: float = 60,
+                   results_db: str = None, skip_ids: set = frozenset(), json_mode: bool = True,
+                   retry_permanent_failures: bool = False):
+    """Analyze the transcripts with start_id <= VideoID <= end_id that are not done yet.
+
+    Interactive by default, or as one offline job with `use_batch_api`. Failures go to the
+    FailureLog; permanent ones are only resubmitted with `retry_permanent_failures`. Videos
+    in `skip_ids` are treated as already processed (used by sharded runs).
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    input_file = os.path.join(script_dir, input_file)
+    output_file = os.path.join(script_dir, output_file)
+
+    progress = ProgressBitmap(f"{os.path.splitext(output_file)[0]}_progress.bin")
+    failures = FailureLog(output_file)
+    sync_progress(output_file, progress, failures)
+    processed_video_ids = progress.load_range(start_id, end_id) | {video_id for video_id in skip_ids if start_id <= video_id <= end_id}
+    permanent_failure_ids = set() if retry_permanent_failures else \
+        {video_id for video_id in failures.permanent_ids() if start_id <= video_id <= end_id} - processed_video_ids
+    videos_skipped = len(processed_video_ids)
+    if videos_skipped:
+        print(f"{videos_skipped} videos in range already processed. Skipping.")
+    if permanent_failure_ids:
+        print(f"{len(permanent_failure_ids)} videos in range failed permanently before. Skipping "
+              f"(set retry_permanent_failures to resubmit them).")
 
-                try:
-                    time_since_last_request = time.time() - last_request_time
-                    if time_since_last_request < min_request_interval:
-                        time.sleep(min_request_interval - time_since_last_request)
-
-                    analysis = analyze_transcript(transcript, api_key, model)
-                    last_request_time = time.time()
-                    
-                    if analysis.startswith("Error:") or analysis.startswith("Request Error:") or analysis.startswith("JSON Decode Error:") or analysis.startswith("Key Error:") or analysis.startswith("Unexpected Error:"):
-                        print(f"Error analyzing video {video_id}: {analysis}")
-                        writer.writerow({
-                            'VideoID': video_id,
-                            'Title': title,
-                            'URL': url,
-                            'Electrical Terms': 'Error in analysis',
-                            'Problems/Challenges': 'Error in analysis',
-                            'Tools/Equipment': 'Error in analysis',
-                            'Educational Content': 'Error in analysis'
-                        })
-                        videos_processed += 1
-                        continue
-                    
-                    analysis_dict = json.loads(analysis)
-                    
-                    writer.writerow({
-                        'VideoID': video_id,
-                        'Title': title,
-                        'URL': url,
-                        'Electrical Terms': ', '.join(analysis_dict.get('Electrical_Terms', [])),
-                        'Problems/Challenges': ', '.join(analysis_dict.get('Problems_Challenges', [])),
-                        'Tools/Equipment': ', '.join(analysis_dict.get('Tools_Equipment', [])),
-                        'Educational Content': ', '.join(analysis_dict.get('Educational_Content', []))
-                    })
-
-                    print(f"Analysis complete for video: {video_id}")
-                    videos_processed += 1
-
-                except Exception as e:
-                    print(f"Error processing video {video_id}: {str(e)}")
-
-    print(f"Analysis complete. Processed {videos_processed} new videos, skipped {videos_skipped} already processed videos.")
+    # One pooled session for the whole run: every request after the first reuses a warm connection.
+    # Video workers and chunk workers both send requests, so up to 2 * max_workers can be in flight
+    client = AnalysisClient(api_key, model, api_base_url, 2 * max_workers, connect_timeout, read_timeout,
+                            max_retries, backoff_base, backoff_max)
+    cache = ResponseCache(os.path.join(script_dir, cache_file), cache_max_bytes) if cache_file else None
+    analyzer = Analyzer(client, RateLimiter(requests_per_minute, tokens_per_minute), cache,
+                        chunk_max_tokens, chunk_overlap_tokens, json_mode, max_workers)
+    store = ResultStore(os.path.join(script_dir, results_db)) if results_db else None
+    results = ResultWriter(output_file, progress, failures, store)
+    try:
+        videos = videos_to_analyze(iter_transcripts(input_file, start_id, end_id, processed_video_ids | permanent_failure_ids),
+                                   results, analyzer, min_transcript_words)
+        if use_batch_api:
+            analyze_batch(videos, analyzer, results, output_file, poll_interval)
+        else:
+            analyze_interactive(videos, analyzer, results, max_workers)
+    finally:
+        analyzer.close()
+        results.close()
+        client.close()
+        if cache is not None:
+            print(f"Response cache: {cache.hits} hits, {cache.misses} misses")
+            cache.close()
+    print(f"Analysis complete. Processed {results.processed} new videos, skipped {videos_skipped} already processed videos.")
     print(f"Videos with IDs >= {start_id} and <= {end_id} have been analyzed. Results updated in {output_file}")
 
+def shard_path(path: str, shard_index: int) -> str:
+    stem, extension = os.path.splitext(path)
+    return f"{stem}_shard{shard_index}{extension}"
+
+def shard_ranges(start_id: int, end_id: int, num_shards: int) -> List[tuple]:
+    """Split [start_id, end_id] into `num_shards` contiguous, non-overlapping ranges"""
+    size = end_id - start_id + 1
+    bounds = [start_id + size * i // num_shards for i in range(num_shards + 1)]
+    return [(bounds[i], bounds[i + 1] - 1) for i in range(num_shards) if bounds[i] < bounds[i + 1]]
+
+def merge_shards(output_file: str, shard_files: List[str]):
+    """Combine the existing output and shard CSVs into one file sorted by VideoID.
+
+    Each VideoID keeps its last successful row (inputs read in order: existing output, then
+    shards by index), or its last error row if it never succeeded, so the result only
+    depends on the inputs, not on which worker finished first.
+    """
+    rows_by_id = {}
+    for path in [output_file] + shard_files:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', newline='', encoding='utf-8') as csvfile:
+            for row in csv.DictReader(csvfile):
+                if not row['VideoID'].isdigit():
+                    continue
+                video_id = int(row['VideoID'])
+                previous = rows_by_id.get(video_id)
+                if previous is None or row['Electrical Terms'] != 'Error in analysis' or previous['Electrical Terms'] == 'Error in analysis':
+                    rows_by_id[video_id] = row
+
+    with download_url.atomic_write(output_file, newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_HEADERS)
+        writer.writeheader()
+        for video_id in sorted(rows_by_id):
+            writer.writerow(rows_by_id[video_id])
+
+    ProgressBitmap(f"{os.path.splitext(output_file)[0]}_progress.bin").rebuild(
+        {video_id for video_id, row in rows_by_id.items() if row['Electrical Terms'] != 'Error in analysis'})
+    print(f"Merged {len(shard_files)} shards into {output_file} ({len(rows_by_id)} videos)")
+
+def merge_result_shards(results_db: str, shard_dbs: List[str]):
+    """Fold shard ResultStores into the main one; later shards replace earlier results per VideoID"""
+    store = ResultStore(results_db)
+    for shard_db in shard_dbs:
+        if not os.path.exists(shard_db):
+            continue
+        store.connection.execute('ATTACH DATABASE ? AS shard', (shard_db,))
+        store.connection.execute('DELETE FROM items WHERE video_id IN (SELECT video_id FROM shard.videos)')
+        store.connection.execute('INSERT OR REPLACE INTO videos SELECT * FROM shard.videos')
+        store.connection.execute('INSERT INTO items SELECT * FROM shard.items')
+        store.connection.commit()
+        store.connection.execute('DETACH DATABASE shard')
+    store.close()
+
+def run_sharded(num_shards: int, start_id: int, end_id: int, input_file: str, output_file: str, api_key: str, model: str,
+                min_transcript_words: int, **options):
+    """Analyze [start_id, end_id] with `num_shards` worker processes, then merge their outputs.
+
+    Each worker runs process_videos on its own ID range and writes its own shard CSV
+    (and ResultStore), so no two processes ever append to the same file. Rate limits are
+    divided evenly between the workers. Shard files are removed once merged.
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    output_file = os.path.join(script_dir, output_file)
+    results_db = os.path.join(script_dir, options['results_db']) if options.get('results_db') else None
+    input_file = os.path.join(script_dir, input_file)
+
+    # Shared inputs are prepared once here: shards only read the sorted index, and a legacy
+    # output CSV is migrated to a progress bitmap before its done videos are handed out
+    if input_file.endswith('.jsonl'):
+        build_sorted_index(input_file)
+    progress = ProgressBitmap(f"{os.path.splitext(output_file)[0]}_progress.bin")
+    sync_progress(output_file, progress, FailureLog(output_file))
+
+    # Videos already in the merged output are not redone by the shards
+    done_ids = progress.load_range(start_id, end_id)
+    # Shards keep their own failure logs, so permanent failures of earlier runs are passed in as skipped
+    if not options.get('retry_permanent_failures'):
+        done_ids |= {video_id for video_id in FailureLog(output_file).permanent_ids() if start_id <= video_id <= end_id}
+
+    for key in ('requests_per_minute', 'tokens_per_minute'):
+        if key in options:
+            options[key] = max(1, options[key] // num_shards)
+
+    ranges = shard_ranges(start_id, end_id, num_shards)
+    shard_files = [shard_path(output_file, i) for i in range(len(ranges))]
+    shard_dbs = [shard_path(results_db, i) for i in range(len(ranges))] if results_db else []
+    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = []
+        for i, (shard_start, shard_end) in enumerate(ranges):
+            shard_options = dict(options, skip_ids={video_id for video_id in done_ids if shard_start <= video_id <= shard_end})
+            if results_db:
+                shard_options['results_db'] = shard_dbs[i]
+            print(f"Shard {i}: VideoIDs {shard_start}-{shard_end} -> {shard_files[i]}")
+            futures.append(executor.submit(process_videos, shard_start, shard_end, input_file, shard_files[i],
+                                           api_key, model, min_transcript_words, **shard_options))
+        for future in futures:
+            future.result()  # Re-raise a worker's exception before merging anything
+
+    merge_shards(output_file, shard_files)
+    if results_db:
+        merge_result_shards(results_db, shard_dbs)
+    failures = FailureLog(output_file)
+    for shard_file in shard_files:
+        failures.extend(FailureLog(shard_file).load())
+    for path in shard_files + shard_dbs:
+        for leftover in (path, f"{os.path.splitext(path)[0]}_progress.bin", FailureLog(path).path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
 if __name__ == "__main__":
     # Configuration variables (easily modifiable)
     START_ID = 0
     END_ID = 3 #3653 for final
-    INPUT_FILE = os.path.join('..', '01_download_URL_Transcript_Comment', 'transcripts.json')
+    INPUT_FILE = os.path.join('..', '01_download_URL_Transcript_Comment', 'transcripts.jsonl')  # Legacy transcripts.json also accepted
     OUTPUT_FILE = 'transcript_4o_mini_test.csv'
     API_KEY = os.getenv('OPENAI_API_KEY')
     MODEL = "gpt-4o-mini"  # Change to "gpt-4o" for final analysis
     MIN_TRANSCRIPT_WORDS = 20  # Minimum words in transcript to be considered for analysis
+    MAX_WORKERS = 8  # Requests in flight at once
+    REQUESTS_PER_MINUTE = 500  # Match the RPM limit of your OpenAI usage tier for MODEL
+    TOKENS_PER_MINUTE = 200000  # Match the TPM limit of your OpenAI usage tier for MODEL
+    USE_BATCH_API = False  # True for cheaper offline runs over the full corpus (results within 24h)
+    API_BASE_URL = 'https://api.openai.com/v1'  # Point at a local stand-in server for testing
+    BATCH_POLL_INTERVAL = 60  # Seconds between batch status checks
+    CONNECT_TIMEOUT = 10  # Seconds to establish a connection
+    READ_TIMEOUT = 120  # Seconds to wait for a completion; long transcripts can take a while
+    CACHE_FILE = 'analysis_cache.sqlite'  # Set to None to disable the response cache
+    CACHE_MAX_BYTES = 512 * 1024 * 1024  # Least recently used analyses are evicted beyond this
+    CHUNK_MAX_TOKENS = 12000  # Longer transcripts are analyzed in chunks and merged
+    CHUNK_OVERLAP_TOKENS = 300  # Repeated between neighboring chunks
+    MAX_RETRIES = 5  # Retries for 429/5xx/timeouts before a video is recorded as failed
+    RETRY_PERMANENT_FAILURES = False  # True resubmits videos the API rejected permanently (e.g. 400 context length)
+    BACKOFF_BASE = 1  # Seconds; doubled per attempt, with jitter
+    BACKOFF_MAX = 60  # Upper bound on a single backoff delay
+    RESULTS_DB = 'analysis_results.sqlite'  # One row per (VideoID, category, item); None to skip
+    NUM_SHARDS = 1  # >1 splits START_ID..END_ID across worker processes and merges their outputs
+    JSON_MODE = True  # Ask for response_format=json_object; set False for models that do not support it
+
+    options = dict(
+        max_workers=MAX_WORKERS, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE,
+        use_batch_api=USE_BATCH_API, api_base_url=API_BASE_URL, poll_interval=BATCH_POLL_INTERVAL,
+        connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, cache_file=CACHE_FILE, cache_max_bytes=CACHE_MAX_BYTES,
+        chunk_max_tokens=CHUNK_MAX_TOKENS, chunk_overlap_tokens=CHUNK_OVERLAP_TOKENS,
+        max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, results_db=RESULTS_DB,
+        json_mode=JSON_MODE, retry_permanent_failures=RETRY_PERMANENT_FAILURES
+    )
 
     # Run the analysis
-    process_videos(START_ID, END_ID, INPUT_FILE, OUTPUT_FILE, API_KEY, MODEL, MIN_TRANSCRIPT_WORDS)
\ No newline at end of file
+    if NUM_SHARDS > 1:
+        run_sharded(NUM_SHARDS, START_ID, END_ID, INPUT_FILE, OUTPUT_FILE, API_KEY, MODEL, MIN_TRANSCRIPT_WORDS, **options)
+    else:
+        process_videos(START_ID, END_ID, INPUT_FILE, OUTPUT_FILE, API_KEY, MODEL, MIN_TRANSCRIPT_WORDS, **options)
\ No newline at end of file
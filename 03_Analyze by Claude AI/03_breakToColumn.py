@@ -1,16 +1,30 @@
+import os
+import sqlite3
 import pandas as pd
 
-# Load the data
-df = pd.read_csv('02_Problems.csv')
+# Structured results written by process_videos (one row per VideoID, category and item)
+RESULTS_DB = os.path.join('..', '02_Analyze by GPT-4o API', 'analysis_results.sqlite')
 
-# Split each item in 'Problems/Challenges' into separate rows
-df_exploded = df.assign(Problems_Challenges=df['Problems/Challenges'].str.split(', ')).explode('Problems_Challenges')
+if os.path.exists(RESULTS_DB):
+    # Items are already stored one per row, so exploding is an indexed query instead of string splitting
+    with sqlite3.connect(RESULTS_DB) as connection:
+        df_exploded = pd.read_sql_query(
+            "SELECT video_id AS VideoID, item AS Problem_Challenge FROM items "
+            "WHERE category = 'Problems_Challenges' ORDER BY video_id, position",
+            connection
+        )
+else:
+    # Load the data
+    df = pd.read_csv('02_Problems.csv')
 
-# Drop the original 'Problems/Challenges' column
-df_exploded = df_exploded.drop(columns=['Problems/Challenges'])
+    # Split each item in 'Problems/Challenges' into separate rows
+    df_exploded = df.assign(Problems_Challenges=df['Problems/Challenges'].str.split(', ')).explode('Problems_Challenges')
 
-# Rename the exploded column for clarity
-df_exploded.rename(columns={'Problems_Challenges': 'Problem_Challenge'}, inplace=True)
+    # Drop the original 'Problems/Challenges' column
+    df_exploded = df_exploded.drop(columns=['Problems/Challenges'])
+
+    # Rename the exploded column for clarity
+    df_exploded.rename(columns={'Problems_Challenges': 'Problem_Challenge'}, inplace=True)
 
 # Save the result to a new CSV file or display it
 df_exploded.to_csv('03_exploded_problems_challenges.csv', index=False)
@@ -0,0 +1,338 @@
+import os
+import re
+import sys
+import json
+import math
+import hashlib
+import importlib
+from collections import Counter
+from typing import List, Dict, Iterable
+import numpy as np
+
+# Reuse the transcript store and chunking helpers of the download stage
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DOWNLOAD_DIR = os.path.join(script_dir, '..', '01_Download Transcript by Youtube API')
+sys.path.insert(0, DOWNLOAD_DIR)
+download_transcript = importlib.import_module('03_download_transcript')
+download_url = importlib.import_module('01_download_URL')
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['.][a-z0-9]+)*")
+# One row per chunk; the chunk text itself lives in chunks.txt at [text_offset, text_offset + text_length)
+CHUNK_DTYPE = np.dtype([('video_id', '<i4'), ('start', '<f4'), ('text_offset', '<i8'), ('text_length', '<i4')])
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+class HashingEmbedder:
+    """Offline embedder: signed feature hashing of word unigrams and bigrams, L2-normalized.
+
+    No model download and no state, so the same text always maps to the same vector.
+    Good enough for keyword-heavy trade vocabulary; swap in a neural model for paraphrases.
+    """
+    name = 'hashing'
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def spec(self) -> Dict:
+        return {'name': self.name, 'dim': self.dim}
+
+    def feature(self, token: str) -> tuple:
+        """(column, sign) of a unigram or bigram; recomputed every time, since blake2b is cheap"""
+        value = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            counts = Counter(tokens)
+            counts.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+            for token, count in counts.items():
+                column, sign = self.feature(token)
+                vectors[row, column] += sign * (1 + math.log(count))  # Sublinear term frequency
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+class SentenceTransformerEmbedder:
+    """Local CPU model from sentence-transformers (optional dependency, loaded on first use)"""
+    name = 'sentence-transformers'
+
+    def __init__(self, model: str = 'all-MiniLM-L6-v2', dim: int = None):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model
+        self.model = SentenceTransformer(model, device='cpu')
+        self.dim = dim or self.model.get_sentence_embedding_dimension()
+
+    def spec(self) -> Dict:
+        return {'name': self.name, 'dim': self.dim, 'model': self.model_name}
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+EMBEDDERS = {embedder.name: embedder for embedder in (HashingEmbedder, SentenceTransformerEmbedder)}
+
+def load_embedder(spec: Dict):
+    """Recreate the embedder an index was built with from its stored spec"""
+    params = {key: value for key, value in spec.items() if key != 'name'}
+    return EMBEDDERS[spec['name']](**params)
+
+def transcript_hash(record: Dict) -> str:
+    """Fingerprint of a record's transcript text and segments, to notice a re-downloaded transcript"""
+    content = json.dumps([record.get('Transcript'), record.get('Segments')], ensure_ascii=False)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+def chunk_words(transcript: str, words_per_chunk: int, overlap_words: int) -> List[str]:
+    """Overlapping word windows, for transcripts stored without segment timings"""
+    words = transcript.split()
+    step = max(1, words_per_chunk - overlap_words)
+    return [' '.join(words[start:start + words_per_chunk]) for start in range(0, max(1, len(words) - overlap_words), step)]
+
+def chunk_record(record: Dict, window_seconds: float, words_per_chunk: int, overlap_words: int) -> List[Dict]:
+    """Chunks of one transcript: time windows with a start time when segments exist, word windows otherwise"""
+    if record.get('Segments'):
+        return [{'start': chunk['start'], 'text': chunk['text']} for chunk in download_transcript.chunk_by_time(record, window_seconds)]
+    return [{'start': -1.0, 'text': text} for text in chunk_words(record.get('Transcript') or '', words_per_chunk, overlap_words)]
+
+class VectorIndex:
+    """Chunk embeddings on disk: a float32 matrix searched through a memory map.
+
+    Files in `directory`:
+      vectors.f32  row-major float32 matrix, one L2-normalized row per chunk
+      chunks.bin   CHUNK_DTYPE records, row i describes vectors row i
+      chunks.txt   UTF-8 chunk texts, read only for the hits of a query
+      meta.json    embedder spec, chunk settings, build generation, row count and
+                   Title/URL/transcript hash per indexed VideoID
+
+    Rows are only appended, and meta.json is replaced last, so an interrupted build leaves
+    the previous index intact (extra rows past meta['count'] are truncated on the next build).
+    The generation is bumped whenever the rows are discarded, so indexes keyed by row number
+    (the BM25 index) can tell that their rows now point at different chunks. Since rows are
+    never replaced, a video whose transcript changed after it was indexed is reported in
+    `changed_videos` and stays as indexed until a rebuild.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, 'vectors.f32')
+        self.chunks_path = os.path.join(directory, 'chunks.bin')
+        self.text_path = os.path.join(directory, 'chunks.txt')
+        self.meta_path = os.path.join(directory, 'meta.json')
+        self.meta = self.load_meta()
+        self.embedder = None
+        self.vectors = None
+        self.chunks = None
+        self.changed_videos = []
+
+    def load_meta(self) -> Dict:
+        if not os.path.exists(self.meta_path):
+            return {'embedder': None, 'chunking': None, 'generation': 0, 'count': 0, 'videos': {}}
+        with open(self.meta_path, 'r', encoding='utf-8') as metafile:
+            return json.load(metafile)
+
+    def build_id(self) -> Dict:
+        """Identifies which chunks the rows are; equal build IDs mean row i is the same chunk"""
+        return {'generation': self.meta.get('generation', 0), 'embedder': self.meta['embedder'],
+                'chunking': self.meta.get('chunking')}
+
+    def save_meta(self):
+        with download_url.atomic_write(self.meta_path, encoding='utf-8') as metafile:
+            json.dump(self.meta, metafile, ensure_ascii=False)
+
+    def __len__(self) -> int:
+        return self.meta['count']
+
+    def truncate_to_meta(self):
+        """Drop rows written after the last saved meta.json (an interrupted build)"""
+        count = self.meta['count']
+        text_end = 0
+        if count:
+            last = np.fromfile(self.chunks_path, dtype=CHUNK_DTYPE, count=1, offset=(count - 1) * CHUNK_DTYPE.itemsize)[0]
+            text_end = int(last['text_offset']) + int(last['text_length'])
+        for path, size in ((self.vectors_path, count * self.meta['embedder']['dim'] * 4),
+                           (self.chunks_path, count * CHUNK_DTYPE.itemsize), (self.text_path, text_end)):
+            with open(path, 'ab') as file:
+                file.truncate(size)
+
+    def build(self, records: Iterable[Dict], embedder=None, window_seconds: float = 60,
+              words_per_chunk: int = 200, overlap_words: int = 40, batch_size: int = 256, rebuild: bool = False) -> int:
+        """Embed and append the chunks of every record not indexed yet; returns the number of new chunks.
+
+        Records are streamed and embedded `batch_size` chunks at a time, so memory use does
+        not grow with the corpus. With `rebuild`, the existing index is discarded first.
+        Indexed videos whose transcript hash differs are collected in `changed_videos`.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        if rebuild or self.meta['embedder'] is None:
+            self.meta = {'embedder': None, 'chunking': None, 'generation': self.meta.get('generation', 0) + 1,
+                         'count': 0, 'videos': {}}
+            # Saved before the rows go, so an interrupted rebuild never leaves the old build ID behind
+            self.save_meta()
+            for path in (self.vectors_path, self.chunks_path, self.text_path):
+                open(path, 'wb').close()
+        if embedder is None:
+            embedder = load_embedder(self.meta['embedder']) if self.meta['embedder'] else HashingEmbedder()
+        if self.meta['embedder'] is None:
+            self.meta['embedder'] = embedder.spec()
+        elif self.meta['embedder'] != embedder.spec():
+            raise ValueError(f"Index was built with {self.meta['embedder']}, not {embedder.spec()}; use rebuild=True")
+        chunking = {'window_seconds': window_seconds, 'words_per_chunk': words_per_chunk, 'overlap_words': overlap_words}
+        if self.meta.get('chunking') is None:
+            self.meta['chunking'] = chunking  # Also adopted by indexes from before chunk settings were stored
+        elif self.meta['chunking'] != chunking:
+            raise ValueError(f"Index was built with chunk settings {self.meta['chunking']}, not {chunking}; use rebuild=True")
+        self.truncate_to_meta()
+        self.embedder = embedder
+        self.vectors = self.chunks = None  # Stale memory maps
+
+        added = 0
+        pending = []  # (video_id, start, text)
+        self.changed_videos = []
+
+        with open(self.vectors_path, 'ab') as vectorfile, open(self.chunks_path, 'ab') as chunkfile, \
+                open(self.text_path, 'ab') as textfile:
+            def flush():
+                nonlocal added
+                if not pending:
+                    return
+                vectors = embedder.embed([text for _, _, text in pending])
+                rows = np.zeros(len(pending), dtype=CHUNK_DTYPE)
+                for i, (video_id, start, text) in enumerate(pending):
+                    encoded = text.encode('utf-8')
+                    rows[i] = (video_id, start, textfile.tell(), len(encoded))
+                    textfile.write(encoded)
+                vectorfile.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                chunkfile.write(rows.tobytes())
+                added += len(pending)
+                pending.clear()
+
+            for record in records:
+                video_id = str(record['VideoID'])
+                if not record.get('Transcript'):
+                    continue
+                if video_id in self.meta['videos']:
+                    indexed = self.meta['videos'][video_id]
+                    content_hash = transcript_hash(record)
+                    if len(indexed) < 3:
+                        indexed.append(content_hash)  # Indexed before hashes were stored; adopt the current one
+                    elif indexed[2] != content_hash:
+                        self.changed_videos.append(int(video_id))
+                    continue
+                for chunk in chunk_record(record, window_seconds, words_per_chunk, overlap_words):
+                    pending.append((int(video_id), chunk['start'], chunk['text']))
+                    if len(pending) >= batch_size:
+                        flush()
+                self.meta['videos'][video_id] = [record.get('Title', ''), record.get('URL', ''), transcript_hash(record)]
+            flush()
+
+        self.meta['count'] += added
+        self.save_meta()
+        if self.changed_videos:
+            print(f"{len(self.changed_videos)} indexed videos have a changed transcript (e.g. VideoID "
+                  f"{self.changed_videos[0]}) and still serve the old one; rebuild the index to re-index them")
+        return added
+
+    def open(self, embedder=None):
+        """Memory-map the index for searching; nothing is read until a query touches it"""
+        self.meta = self.load_meta()
+        if self.meta['embedder'] is None:
+            raise ValueError(f"No vector index in {self.directory}; build it with 01_build_vector_index.py first")
+        self.embedder = embedder or load_embedder(self.meta['embedder'])
+        count, dim = self.meta['count'], self.meta['embedder']['dim']
+        if count:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(count, dim))
+            self.chunks = np.memmap(self.chunks_path, dtype=CHUNK_DTYPE, mode='r', shape=(count,))
+        else:
+            self.vectors = np.zeros((0, dim), dtype=np.float32)
+            self.chunks = np.zeros(0, dtype=CHUNK_DTYPE)
+        return self
+
+    def chunk_text(self, row: int) -> str:
+        chunk = self.chunks[row]
+        with open(self.text_path, 'rb') as textfile:
+            textfile.seek(int(chunk['text_offset']))
+            return textfile.read(int(chunk['text_length'])).decode('utf-8')
+
+    def hit(self, row: int, score: float) -> Dict:
+        chunk = self.chunks[row]
+        video_id = int(chunk['video_id'])
+        title, url = self.meta['videos'].get(str(video_id), ['', ''])[:2]
+        start = float(chunk['start'])
+        return {
+            'VideoID': video_id,
+            'Title': title,
+            'URL': f"{url}&t={int(start)}s" if start >= 0 and url else url,
+            'Timestamp': download_transcript.format_timestamp(start) if start >= 0 else None,
+            'Row': row,
+            'Score': score,
+            'Text': self.chunk_text(row),
+        }
+
+    def search_vectors(self, query_vectors: np.ndarray, k: int = 5, block_rows: int = 65536) -> List[List[tuple]]:
+        """Top-k (row, cosine) per query, scanning the matrix in blocks to bound memory use.
+
+        All queries are scored against a block in one matrix product; each block's best k
+        are merged with the running best k, so the full score matrix is never materialized.
+        """
+        if self.vectors is None:
+            self.open()
+        count = len(self.vectors)
+        k = min(k, count)
+        num_queries = len(query_vectors)
+        if k == 0:
+            return [[] for _ in range(num_queries)]
+        best_scores = np.full((num_queries, 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((num_queries, 0), dtype=np.int64)
+        queries = np.ascontiguousarray(query_vectors, dtype=np.float32).T
+        for block_start in range(0, count, block_rows):
+            scores = np.asarray(self.vectors[block_start:block_start + block_rows]) @ queries  # (rows, queries)
+            scores = scores.T
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, top + block_start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return [list(zip(rows.tolist(), scores.tolist())) for rows, scores in zip(best_rows, best_scores)]
+
+    def search(self, queries: List[str], k: int = 5) -> List[List[Dict]]:
+        """Top-k chunks per query with VideoID, title, timestamped URL, cosine score and text"""
+        if self.vectors is None:
+            self.open()
+        results = self.search_vectors(self.embedder.embed(queries), k)
+        return [[self.hit(row, score) for row, score in hits] for hits in results]
+
+if __name__ == "__main__":
+    # The line-delimited store written by 03_download_transcript.py
+    TRANSCRIPT_STORE = os.path.join(DOWNLOAD_DIR, '04_transcripts.jsonl')
+    LEGACY_TRANSCRIPTS = os.path.join(DOWNLOAD_DIR, '04_transcripts.json')
+    INDEX_DIR = os.path.join(script_dir, 'vector_index')
+
+    # Index settings
+    EMBEDDER = HashingEmbedder(dim=1024)  # Or SentenceTransformerEmbedder('all-MiniLM-L6-v2') for a local CPU model
+    WINDOW_SECONDS = 60  # Chunk length for transcripts with segment timings
+    WORDS_PER_CHUNK = 200  # Chunk length for transcripts without them
+    OVERLAP_WORDS = 40
+    REBUILD = False  # True re-embeds everything (needed after changing the embedder or re-downloading transcripts)
+
+    if not os.path.exists(TRANSCRIPT_STORE) and os.path.exists(LEGACY_TRANSCRIPTS):
+        download_transcript.migrate_json_to_store(LEGACY_TRANSCRIPTS, TRANSCRIPT_STORE)
+
+    index = VectorIndex(INDEX_DIR)
+    added = index.build(download_transcript.TranscriptStore(TRANSCRIPT_STORE).iter_latest(), EMBEDDER, WINDOW_SECONDS,
+                        WORDS_PER_CHUNK, OVERLAP_WORDS, rebuild=REBUILD)
+    print(f"Indexed {added} new chunks ({len(index)} chunks from {len(index.meta['videos'])} videos) in {INDEX_DIR}")
+
+    # Example queries
+    queries = ["how to wire a GFCI outlet", "conduit bending tips"]
+    index.open(EMBEDDER)
+    for query, hits in zip(queries, index.search(queries, k=3)):
+        print(f"\n{query}")
+        for hit in hits:
+            print(f"  {hit['Score']:.3f}  {hit['Title']} {hit['Timestamp'] or ''}  {hit['URL']}")
@@ -0,0 +1,294 @@
+import os
+import sys
+import csv
+import json
+import math
+import heapq
+import sqlite3
+import importlib
+from collections import Counter
+from typing import List, Dict, Iterable
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+vector_index = importlib.import_module('01_build_vector_index')
+download_url = importlib.import_module('01_download_URL')  # On sys.path via 01_build_vector_index
+
+ANALYSIS_DIR = os.path.join(script_dir, '..', '02_Analyze by GPT-4o API')
+# Per-video lists from process_videos that are indexed as their own field
+TERM_CATEGORIES = {'Electrical_Terms': 'Electrical Terms', 'Tools_Equipment': 'Tools/Equipment'}
+
+class Segment:
+    """Immutable postings for one batch of documents, memory-mapped from disk.
+
+    `doc_ids` holds segment-local document numbers, sorted within each term's slice
+    vocab[term] = [start, count]; `tfs` holds the matching term frequencies. Local document i
+    is `doc_keys[i]` to the caller (a chunk row or a VideoID) and has `doc_lengths[i]` tokens.
+    """
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        with open(f"{prefix}_vocab.json", 'r', encoding='utf-8') as vocabfile:
+            self.vocab = json.load(vocabfile)
+        self.doc_ids = np.load(f"{prefix}_doc_ids.npy", mmap_mode='r')
+        self.tfs = np.load(f"{prefix}_tfs.npy", mmap_mode='r')
+        self.doc_keys = np.load(f"{prefix}_doc_keys.npy")
+        self.doc_lengths = np.load(f"{prefix}_doc_lengths.npy")
+
+    @staticmethod
+    def write(prefix: str, postings: Dict[str, tuple], doc_keys: List[int], doc_lengths: List[int]):
+        """Write postings {term: (doc_ids, tfs)}; doc_ids must already be in ascending order"""
+        vocab = {}
+        doc_id_parts, tf_parts = [], []
+        position = 0
+        for term in sorted(postings):
+            doc_ids, tfs = postings[term]
+            vocab[term] = [position, len(doc_ids)]
+            doc_id_parts.append(np.asarray(doc_ids, dtype=np.int32))
+            tf_parts.append(np.asarray(tfs, dtype=np.int32))
+            position += len(doc_ids)
+        np.save(f"{prefix}_doc_ids.npy", np.concatenate(doc_id_parts) if doc_id_parts else np.zeros(0, dtype=np.int32))
+        np.save(f"{prefix}_tfs.npy", np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.int32))
+        np.save(f"{prefix}_doc_keys.npy", np.asarray(doc_keys, dtype=np.int64))
+        np.save(f"{prefix}_doc_lengths.npy", np.asarray(doc_lengths, dtype=np.int32))
+        # Vocabulary last: a segment without one was never completed
+        with open(f"{prefix}_vocab.json", 'w', encoding='utf-8') as vocabfile:
+            json.dump(vocab, vocabfile, ensure_ascii=False)
+
+    def postings(self, term: str) -> tuple:
+        start, count = self.vocab.get(term, (0, 0))
+        return self.doc_ids[start:start + count], self.tfs[start:start + count]
+
+    def remove(self):
+        for suffix in ('_vocab.json', '_doc_ids.npy', '_tfs.npy', '_doc_keys.npy', '_doc_lengths.npy'):
+            if os.path.exists(self.prefix + suffix):
+                os.remove(self.prefix + suffix)
+
+class BM25Field:
+    """One searchable field made of append-only segments, scored with Okapi BM25.
+
+    New documents go into a new segment, so an incremental build never rewrites existing
+    postings; once there are more than `max_segments`, they are merged into one.
+    """
+    def __init__(self, directory: str, name: str, state: Dict, k1: float = 1.2, b: float = 0.75, max_segments: int = 8):
+        self.directory = directory
+        self.name = name
+        self.state = state  # {'segments': [...], 'next_segment': n}, persisted by BM25Index
+        self.k1 = k1
+        self.b = b
+        self.max_segments = max_segments
+        self.segments = [Segment(os.path.join(directory, prefix)) for prefix in state['segments']]
+        self.retired = []  # Segments dropped from the state, deleted once the state is saved
+
+    @property
+    def num_docs(self) -> int:
+        return sum(len(segment.doc_keys) for segment in self.segments)
+
+    def add(self, documents: Iterable[tuple]) -> int:
+        """Index (key, tokens) pairs as a new segment; returns the number of documents added"""
+        postings = {}
+        doc_keys, doc_lengths = [], []
+        for key, tokens in documents:
+            doc_id = len(doc_keys)
+            doc_keys.append(key)
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                doc_ids, tfs = postings.setdefault(term, ([], []))
+                doc_ids.append(doc_id)  # Ascending, since documents are numbered in order
+                tfs.append(tf)
+        if not doc_keys:
+            return 0
+        prefix = f"{self.name}_{self.state['next_segment']}"
+        Segment.write(os.path.join(self.directory, prefix), postings, doc_keys, doc_lengths)
+        self.state['next_segment'] += 1
+        self.state['segments'].append(prefix)
+        self.segments.append(Segment(os.path.join(self.directory, prefix)))
+        if len(self.segments) > self.max_segments:
+            self.merge()
+        return len(doc_keys)
+
+    def merge(self):
+        """Fold all segments into one; local doc numbers are shifted so postings stay sorted"""
+        postings = {}
+        doc_keys, doc_lengths = [], []
+        for segment in self.segments:
+            base = len(doc_keys)
+            for term, (start, count) in segment.vocab.items():
+                doc_ids, tfs = postings.setdefault(term, ([], []))
+                doc_ids.append(np.asarray(segment.doc_ids[start:start + count]) + base)
+                tfs.append(np.asarray(segment.tfs[start:start + count]))
+            doc_keys.extend(segment.doc_keys.tolist())
+            doc_lengths.extend(segment.doc_lengths.tolist())
+        postings = {term: (np.concatenate(doc_ids), np.concatenate(tfs)) for term, (doc_ids, tfs) in postings.items()}
+        prefix = f"{self.name}_{self.state['next_segment']}"
+        Segment.write(os.path.join(self.directory, prefix), postings, doc_keys, doc_lengths)
+        # The old segment files are removed by BM25Index.build once the new state is saved
+        self.retired.extend(self.segments)
+        self.state['next_segment'] += 1
+        self.state['segments'] = [prefix]
+        self.segments = [Segment(os.path.join(self.directory, prefix))]
+
+    def score(self, terms: List[str]) -> tuple:
+        """(keys, scores) of every document matching at least one query term"""
+        num_docs = self.num_docs
+        if not num_docs or not terms:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        average_length = sum(int(segment.doc_lengths.sum()) for segment in self.segments) / num_docs
+        query_terms = Counter(terms)
+        document_frequency = {term: sum(segment.vocab.get(term, (0, 0))[1] for segment in self.segments) for term in query_terms}
+        keys, scores = [], []
+        for segment in self.segments:
+            accumulator = np.zeros(len(segment.doc_keys), dtype=np.float32)
+            length_norm = self.k1 * (1 - self.b + self.b * segment.doc_lengths / average_length)
+            for term, query_tf in query_terms.items():
+                df = document_frequency[term]
+                if not df:
+                    continue
+                doc_ids, tfs = segment.postings(term)
+                if not len(doc_ids):
+                    continue
+                idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+                tfs = np.asarray(tfs, dtype=np.float32)
+                accumulator[doc_ids] += query_tf * idf * tfs * (self.k1 + 1) / (tfs + length_norm[doc_ids])
+            matched = np.nonzero(accumulator)[0]
+            keys.append(segment.doc_keys[matched])
+            scores.append(accumulator[matched])
+        return np.concatenate(keys), np.concatenate(scores)
+
+def load_term_lists(results_db: str = None, results_csv: str = None) -> Dict[int, str]:
+    """VideoID -> Electrical Terms and Tools/Equipment items, from the ResultStore or else the CSV"""
+    terms = {}
+    if results_db and os.path.exists(results_db):
+        with sqlite3.connect(results_db) as connection:
+            rows = connection.execute(
+                f"SELECT video_id, item FROM items WHERE category IN ({', '.join('?' * len(TERM_CATEGORIES))}) "
+                "ORDER BY video_id, category, position", list(TERM_CATEGORIES))
+            for video_id, item in rows:
+                terms.setdefault(video_id, []).append(item)
+    elif results_csv and os.path.exists(results_csv):
+        with open(results_csv, 'r', newline='', encoding='utf-8') as csvfile:
+            for row in csv.DictReader(csvfile):
+                if not row['VideoID'].isdigit() or row['Electrical Terms'] in ('Error in analysis', 'N/A - Short/No Transcript'):
+                    continue
+                for column in TERM_CATEGORIES.values():
+                    terms.setdefault(int(row['VideoID']), []).extend(item for item in row[column].split(', ') if item)
+    return {video_id: ' '.join(items) for video_id, items in terms.items()}
+
+class BM25Index:
+    """Lexical index over the chunks of a VectorIndex plus per-video term lists.
+
+    Documents of the 'text' field are chunk rows of the vector index, so a BM25 hit and a
+    vector hit with the same row are the same passage. The 'terms' field holds one document
+    per video; its score is added (times `terms_weight`) to every chunk of that video.
+    The vector index's build ID is stored with the rows, and the 'text' field is rebuilt
+    when the vector index was rebuilt since (its rows then describe other chunks). Searching
+    an index that was never built, or built from another vector index build, raises ValueError.
+    """
+    def __init__(self, directory: str, chunk_index, terms_weight: float = 0.5):
+        self.directory = directory
+        self.chunk_index = chunk_index
+        self.terms_weight = terms_weight
+        self.meta_path = os.path.join(directory, 'meta.json')
+        self.meta = self.load_meta()
+        self.fields = {name: BM25Field(directory, name, self.meta['fields'][name]) for name in ('text', 'terms')}
+        self.opened = False
+
+    def load_meta(self) -> Dict:
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r', encoding='utf-8') as metafile:
+                return json.load(metafile)
+        return {'chunk_build': None, 'text_rows': 0, 'term_videos': [],
+                'fields': {name: {'segments': [], 'next_segment': 0} for name in ('text', 'terms')}}
+
+    def open(self):
+        """Load the built index for searching, like VectorIndex.open"""
+        if not os.path.exists(self.meta_path):
+            raise ValueError(f"No BM25 index in {self.directory}; build it with 02_build_bm25_index.py first")
+        self.meta = self.load_meta()
+        self.fields = {name: BM25Field(self.directory, name, self.meta['fields'][name]) for name in ('text', 'terms')}
+        self.opened = True
+        return self
+
+    def save_meta(self):
+        with download_url.atomic_write(self.meta_path, encoding='utf-8') as metafile:
+            json.dump(self.meta, metafile)
+
+    def build(self, term_lists: Dict[int, str] = None) -> tuple:
+        """Index chunk rows and term lists that arrived since the last build; returns (chunks, videos) added"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.chunk_index.open()
+
+        if self.meta.get('chunk_build') != self.chunk_index.build_id():
+            if self.meta['text_rows']:
+                print(f"Vector index in {self.chunk_index.directory} was rebuilt; re-indexing all chunk text")
+            text = self.fields['text']
+            text.retired.extend(text.segments)
+            text.state['segments'] = []
+            text.segments = []
+            self.meta['text_rows'] = 0
+            self.meta['chunk_build'] = self.chunk_index.build_id()
+        start_row = self.meta['text_rows']
+        if start_row > len(self.chunk_index):
+            raise ValueError("Chunk index is smaller than when this BM25 index was built; rebuild both")
+        new_rows = range(start_row, len(self.chunk_index))
+        added_chunks = self.fields['text'].add(
+            (row, vector_index.tokenize(self.chunk_index.chunk_text(row))) for row in new_rows)
+        self.meta['text_rows'] = len(self.chunk_index)
+
+        indexed_videos = set(self.meta['term_videos'])
+        new_videos = sorted(video_id for video_id in (term_lists or {}) if video_id not in indexed_videos)
+        added_videos = self.fields['terms'].add(
+            (video_id, vector_index.tokenize(term_lists[video_id])) for video_id in new_videos)
+        self.meta['term_videos'].extend(new_videos)
+
+        self.save_meta()
+        # Segments merged away are only deleted once meta.json no longer refers to them
+        for field in self.fields.values():
+            for segment in field.retired:
+                segment.remove()
+            field.retired.clear()
+        self.opened = True
+        return added_chunks, added_videos
+
+    def search_rows(self, query: str, k: int = 5) -> List[tuple]:
+        """Top-k (row, score) chunk rows for one query, selected with a heap"""
+        terms = vector_index.tokenize(query)
+        if not self.opened:
+            self.open()
+        if self.chunk_index.vectors is None:
+            self.chunk_index.open()
+        if self.meta.get('chunk_build') != self.chunk_index.build_id():
+            raise ValueError(f"BM25 index in {self.directory} predates the current vector index; run 02_build_bm25_index.py")
+        scores = np.zeros(self.meta['text_rows'], dtype=np.float32)
+        rows, text_scores = self.fields['text'].score(terms)
+        scores[rows] += text_scores
+        video_ids, term_scores = self.fields['terms'].score(terms)
+        if len(video_ids) and len(scores):
+            chunk_videos = np.asarray(self.chunk_index.chunks['video_id'][:len(scores)], dtype=np.int64)
+            bonus = np.zeros(max(int(video_ids.max()), int(chunk_videos.max())) + 1, dtype=np.float32)
+            bonus[video_ids] = term_scores
+            scores += self.terms_weight * bonus[chunk_videos]
+        candidates = np.nonzero(scores)[0].tolist()
+        return [(row, float(scores[row])) for row in heapq.nlargest(k, candidates, key=scores.__getitem__)]
+
+    def search(self, queries: List[str], k: int = 5) -> List[List[Dict]]:
+        """Same result shape as VectorIndex.search, with BM25 scores"""
+        return [[self.chunk_index.hit(row, score) for row, score in self.search_rows(query, k)] for query in queries]
+
+if __name__ == "__main__":
+    INDEX_DIR = os.path.join(script_dir, 'bm25_index')
+    VECTOR_INDEX_DIR = os.path.join(script_dir, 'vector_index')  # Built by 01_build_vector_index.py
+    RESULTS_DB = os.path.join(ANALYSIS_DIR, 'analysis_results.sqlite')
+    RESULTS_CSV = os.path.join(ANALYSIS_DIR, 'transcript_4o_mini_test.csv')  # Used when there is no RESULTS_DB
+    TERMS_WEIGHT = 0.5  # Weight of a video's term-list match relative to the chunk text match
+
+    index = BM25Index(INDEX_DIR, vector_index.VectorIndex(VECTOR_INDEX_DIR), TERMS_WEIGHT)
+    added_chunks, added_videos = index.build(load_term_lists(RESULTS_DB, RESULTS_CSV))
+    print(f"Indexed {added_chunks} new chunks and {added_videos} new term lists in {INDEX_DIR}")
+
+    # Example queries
+    queries = ["what size conduit for a 200 amp service", "wire stripper"]
+    for query, hits in zip(queries, index.search(queries, k=3)):
+        print(f"\n{query}")
+        for hit in hits:
+            print(f"  {hit['Score']:.2f}  {hit['Title']} {hit['Timestamp'] or ''}  {hit['URL']}")
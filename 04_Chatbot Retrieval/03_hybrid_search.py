@@ -0,0 +1,167 @@
+import os
+import sys
+import time
+import threading
+import importlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+vector_index = importlib.import_module('01_build_vector_index')
+bm25_index = importlib.import_module('02_build_bm25_index')
+
+LEGS = ('vector', 'bm25')
+
+class LatencyStats:
+    """Rolling per-leg latencies (seconds) of the last `window` searches, for p50/p95 reports"""
+    def __init__(self, window: int = 1000):
+        self.lock = threading.Lock()
+        self.samples = {name: deque(maxlen=window) for name in LEGS + ('total',)}
+        self.timeouts = {name: 0 for name in LEGS}
+
+    def record(self, timings: Dict[str, float], timed_out: List[str]):
+        with self.lock:
+            for name, seconds in timings.items():
+                if seconds is not None:
+                    self.samples[name].append(seconds)
+            for name in timed_out:
+                self.timeouts[name] += 1
+
+    def summary(self) -> Dict[str, Dict]:
+        with self.lock:
+            report = {}
+            for name, samples in self.samples.items():
+                if samples:
+                    p50, p95 = np.percentile(np.fromiter(samples, dtype=np.float64), [50, 95])
+                    report[name] = {'count': len(samples), 'p50_ms': float(p50) * 1000, 'p95_ms': float(p95) * 1000}
+                else:
+                    report[name] = {'count': 0, 'p50_ms': None, 'p95_ms': None}
+                if name in self.timeouts:
+                    report[name]['timeouts'] = self.timeouts[name]
+            return report
+
+class HybridRetriever:
+    """Dense + BM25 retrieval over the same chunk rows, fused with reciprocal-rank fusion.
+
+    Both legs run concurrently on a shared thread pool (numpy releases the GIL for the
+    matrix product). The search returns once both legs finish or `budget_seconds` passes,
+    whichever is first; a leg that misses the budget is left out of the fusion and the
+    result is marked partial. Its thread finishes in the background, since a running
+    search cannot be interrupted, and its real duration is still recorded in `stats`.
+
+    A late leg keeps its pool worker until it finishes. If the pool only has room for the
+    legs of the concurrent searches, the next search's legs queue behind the late ones,
+    spend their budget waiting and time out in turn. `max_workers` should therefore be
+    len(LEGS) times the number of concurrent searches, with headroom for late legs; the
+    default of 8 covers two concurrent searches (the chat service's default).
+    """
+    def __init__(self, vectors, bm25, budget_seconds: float = 0.25, candidates: int = 50,
+                 rrf_k: int = 60, max_workers: int = 8, stats_window: int = 1000):
+        self.vectors = vectors
+        self.bm25 = bm25
+        self.budget_seconds = budget_seconds
+        self.candidates = candidates  # Ranked results taken from each leg before fusion
+        self.rrf_k = rrf_k
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.stats = LatencyStats(stats_window)
+        if self.vectors.vectors is None:
+            self.vectors.open()
+
+    def vector_leg(self, queries: List[str]) -> tuple:
+        start = time.perf_counter()
+        # All queries embedded and scored in one pass over the matrix
+        results = self.vectors.search_vectors(self.vectors.embedder.embed(queries), self.candidates)
+        return results, time.perf_counter() - start
+
+    def bm25_leg(self, queries: List[str]) -> tuple:
+        start = time.perf_counter()
+        results = [self.bm25.search_rows(query, self.candidates) for query in queries]
+        return results, time.perf_counter() - start
+
+    def record_late_leg(self, name: str, future):
+        """Record the real duration of a leg that finished after its search gave up on it"""
+        if not future.cancelled() and future.exception() is None:
+            self.stats.record({name: future.result()[1]}, [])
+
+    def fuse(self, ranked_lists: Dict[str, List[tuple]], k: int) -> List[Dict]:
+        """Reciprocal-rank fusion: score(row) = sum over legs of 1 / (rrf_k + rank)"""
+        fused = {}
+        ranks = {}
+        for name, ranked in ranked_lists.items():
+            for rank, (row, _) in enumerate(ranked, start=1):
+                fused[row] = fused.get(row, 0.0) + 1.0 / (self.rrf_k + rank)
+                ranks.setdefault(row, {})[name] = rank
+        best = sorted(fused.items(), key=lambda item: (-item[1], item[0]))[:k]
+        hits = []
+        for row, score in best:
+            hit = self.vectors.hit(row, score)
+            hit['Ranks'] = ranks[row]  # Rank of this chunk in each leg that found it
+            hits.append(hit)
+        return hits
+
+    def search(self, queries: List[str], k: int = 5, budget_seconds: float = None) -> List[Dict]:
+        """Top-k fused hits per query, each result with per-leg timings and a `partial` flag"""
+        budget = self.budget_seconds if budget_seconds is None else budget_seconds
+        start = time.perf_counter()
+        futures = {
+            self.executor.submit(self.vector_leg, queries): 'vector',
+            self.executor.submit(self.bm25_leg, queries): 'bm25',
+        }
+        done, _ = wait(futures, timeout=budget)
+
+        leg_results = {}
+        timings = {name: None for name in LEGS}
+        for future in done:
+            name = futures[future]
+            try:
+                leg_results[name], timings[name] = future.result()
+            except Exception as e:
+                print(f"{name} search failed: {str(e)}")
+        timed_out = [futures[future] for future in futures if future not in done]
+        for future in futures:
+            if future not in done:
+                future.add_done_callback(lambda future, name=futures[future]: self.record_late_leg(name, future))
+
+        results = []
+        for i, query in enumerate(queries):
+            hits = self.fuse({name: ranked[i] for name, ranked in leg_results.items()}, k)
+            results.append({'query': query, 'hits': hits, 'partial': len(leg_results) < len(LEGS)})
+        timings['total'] = time.perf_counter() - start
+        self.stats.record(timings, timed_out)
+        for result in results:
+            result['timings_ms'] = {name: seconds * 1000 if seconds is not None else None for name, seconds in timings.items()}
+            result['timed_out'] = timed_out
+        return results
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+def open_retriever(index_dir: str = script_dir, **options) -> HybridRetriever:
+    """Hybrid retriever over the vector_index and bm25_index directories built by scripts 01 and 02"""
+    vectors = vector_index.VectorIndex(os.path.join(index_dir, 'vector_index')).open()
+    bm25 = bm25_index.BM25Index(os.path.join(index_dir, 'bm25_index'), vectors).open()
+    return HybridRetriever(vectors, bm25, **options)
+
+if __name__ == "__main__":
+    # Retrieval settings
+    BUDGET_SECONDS = 0.25  # Per search call; slower legs are dropped from the result
+    CANDIDATES = 50  # Results taken from each leg before fusion
+    RRF_K = 60  # Larger values flatten the weight of top ranks
+
+    retriever = open_retriever(script_dir, budget_seconds=BUDGET_SECONDS, candidates=CANDIDATES, rrf_k=RRF_K)
+    queries = ["what size conduit for a 200 amp service", "how to wire a GFCI outlet", "hand bender tips"]
+    for result in retriever.search(queries, k=3):
+        print(f"\n{result['query']}  {'(partial) ' if result['partial'] else ''}{result['timings_ms']}")
+        for hit in result['hits']:
+            print(f"  {hit['Score']:.4f} {hit['Ranks']}  {hit['Title']} {hit['Timestamp'] or ''}  {hit['URL']}")
+
+    # Latency profile over repeated searches, for tuning BUDGET_SECONDS and CANDIDATES
+    for _ in range(50):
+        for query in queries:
+            retriever.search([query], k=5)
+    for name, report in retriever.stats.summary().items():
+        print(f"{name}: {report}")
+    retriever.close()
@@ -0,0 +1,552 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import importlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterable
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+hybrid_search = importlib.import_module('03_hybrid_search')
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_HEADER_LINES = 100
+MAX_LINE_BYTES = 8 * 1024  # Request line or one header line
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 431: 'Request Header Fields Too Large',
+                500: 'Internal Server Error', 501: 'Not Implemented', 503: 'Service Unavailable'}
+ANSWER_SYSTEM_PROMPT = ("You are an assistant for electrical construction questions. Answer only from the "
+                        "transcript excerpts provided, and cite videos as [n] with their timestamp.")
+
+class Overloaded(Exception):
+    """The retrieval queue or the LLM queue is full; the client should retry later"""
+
+class StubBackend:
+    """Offline LLM stand-in: quotes the best excerpts, so the service runs without an API key"""
+    def answer(self, question: str, hits: List[Dict]) -> str:
+        if not hits:
+            return "No matching videos found."
+        lines = [f"[{i}] {hit['Title']} {hit['Timestamp'] or ''}: {hit['Text'][:200]}" for i, hit in enumerate(hits[:3], start=1)]
+        return "Relevant excerpts:\n" + "\n".join(lines)
+
+class OpenAIBackend:
+    """Chat completion over the retrieved excerpts, using the analysis stage's pooled, retrying client"""
+    def __init__(self, api_key: str, model: str = 'gpt-4o-mini', api_base_url: str = None, pool_size: int = 8,
+                 max_excerpt_chars: int = 1500):
+        analysis_dir = os.path.join(script_dir, '..', '02_Analyze by GPT-4o API')
+        sys.path.insert(0, analysis_dir)
+        analyze = importlib.import_module('01_analyzeTranscripts')
+        self.client = analyze.AnalysisClient(api_key, model, api_base_url or analyze.API_BASE_URL, pool_size)
+        self.max_excerpt_chars = max_excerpt_chars
+
+    def answer(self, question: str, hits: List[Dict]) -> str:
+        excerpts = "\n\n".join(f"[{i}] {hit['Title']} ({hit['Timestamp'] or 'no timestamp'})\n{hit['Text'][:self.max_excerpt_chars]}"
+                               for i, hit in enumerate(hits, start=1))
+        response = self.client.post('/chat/completions', json={
+            "model": self.client.model,
+            "messages": [
+                {"role": "system", "content": ANSWER_SYSTEM_PROMPT},
+                {"role": "user", "content": f"Excerpts:\n{excerpts}\n\nQuestion: {question}"}
+            ]
+        })
+        response.raise_for_status()
+        return response.json()['choices'][0]['message']['content'].strip()
+
+class VideoVersions:
+    """Fingerprint per VideoID of its transcript and its analysis, to notice when either changes.
+
+    A transcript's fingerprint is a hash of its text and segments (the last record per VideoID
+    wins, as in the store's index), so only videos whose content changed are reported, whether
+    the TranscriptStore was appended to or rewritten. An analysis's fingerprint is a hash of
+    its status and items in the ResultStore. Sources are only re-read when a file's
+    modification time changes. `versions` is replaced, never mutated, so a reference to it
+    is a consistent stamp of what was current at the time.
+    """
+    def __init__(self, transcript_store: str = None, results_db: str = None):
+        self.transcript_store = transcript_store
+        self.results_db = results_db
+        self.mtimes = None
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def current_mtimes(self) -> tuple:
+        paths = [self.results_db, f"{self.results_db}-wal"] if self.results_db else []
+        if self.transcript_store:
+            paths += [self.transcript_store, hybrid_search.vector_index.download_transcript.TranscriptStore(self.transcript_store).index_path]
+        return tuple(os.path.getmtime(path) if os.path.exists(path) else None for path in paths)
+
+    def snapshot(self) -> Dict[int, tuple]:
+        transcripts, analyses = {}, {}
+        if self.transcript_store and os.path.exists(self.transcript_store):
+            for record in hybrid_search.vector_index.download_transcript.TranscriptStore(self.transcript_store):
+                transcripts[int(record['VideoID'])] = hybrid_search.vector_index.transcript_hash(record)
+        if self.results_db and os.path.exists(self.results_db):
+            with sqlite3.connect(self.results_db) as connection:
+                rows = connection.execute(
+                    "SELECT v.video_id, v.status, group_concat(i.category || ':' || i.item, char(31)) "
+                    "FROM videos v LEFT JOIN items i ON i.video_id = v.video_id GROUP BY v.video_id")
+                for video_id, status, items in rows:
+                    analyses[video_id] = hashlib.sha1(f"{status}\x1f{items or ''}".encode('utf-8')).hexdigest()
+        return {video_id: (transcripts.get(video_id), analyses.get(video_id)) for video_id in set(transcripts) | set(analyses)}
+
+    def refresh(self) -> set:
+        """VideoIDs whose transcript or analysis changed since the previous refresh"""
+        with self.lock:
+            mtimes = self.current_mtimes()
+            if mtimes == self.mtimes:
+                return set()
+            first = self.mtimes is None
+            self.mtimes = mtimes
+            versions = self.snapshot()
+            changed = set() if first else {video_id for video_id in set(versions) | set(self.versions)
+                                           if versions.get(video_id) != self.versions.get(video_id)}
+            self.versions = versions
+            return changed
+
+class SemanticAnswerCache:
+    """Generated answers keyed by question embedding, with TTL, LRU eviction and invalidation by VideoID.
+
+    A question whose embedding has cosine similarity >= `threshold` with a cached question
+    gets that question's answer and citations, provided the cached entry was retrieved with
+    at least as many hits as asked for (its hits are cut to the requested k). Embeddings sit in one preallocated float32
+    matrix, so a lookup is a single matrix-vector product. Entries expire after
+    `ttl_seconds`; beyond `capacity` the least recently used is evicted. Every
+    `refresh_seconds`, a background thread checks `versions` and drops entries citing a
+    changed VideoID. Entries are tagged with the versions of the videos they cite, as
+    stamped before retrieval, so an answer built from data that changed meanwhile is not stored.
+    """
+    def __init__(self, embedder, threshold: float = 0.9, ttl_seconds: float = 24 * 3600, capacity: int = 4096,
+                 versions: VideoVersions = None, refresh_seconds: float = 30):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.capacity = capacity
+        self.versions = versions
+        self.refresh_seconds = refresh_seconds
+        self.lock = threading.Lock()
+        self.vectors = None  # Allocated on first put, once the embedding size is known
+        self.active = np.zeros(capacity, dtype=bool)
+        self.entries = OrderedDict()  # slot -> entry, least recently used first
+        self.free_slots = list(range(capacity - 1, -1, -1))
+        self.slots_by_video = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stopped = threading.Event()
+        if versions is not None:
+            versions.refresh()  # Baseline; only later changes invalidate
+            # Re-reading the sources can take a while on a large corpus, so no lookup waits for it
+            threading.Thread(target=self.refresh_loop, daemon=True).start()
+
+    def remove(self, slot: int):
+        entry = self.entries.pop(slot)
+        self.active[slot] = False
+        self.free_slots.append(slot)
+        for video_id in entry['video_ids']:
+            slots = self.slots_by_video.get(video_id)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del self.slots_by_video[video_id]
+
+    def invalidate_videos(self, video_ids: Iterable[int]) -> int:
+        """Drop every entry citing one of `video_ids`; returns the number of entries dropped"""
+        with self.lock:
+            slots = set()
+            for video_id in video_ids:
+                slots |= self.slots_by_video.get(video_id, set())
+            for slot in slots:
+                self.remove(slot)
+            self.invalidations += len(slots)
+            return len(slots)
+
+    def refresh(self):
+        changed = self.versions.refresh()
+        if changed:
+            print(f"Answer cache: {self.invalidate_videos(changed)} entries invalidated for {len(changed)} changed videos")
+
+    def refresh_loop(self):
+        while not self.stopped.wait(self.refresh_seconds):
+            try:
+                self.refresh()
+            except Exception as e:  # E.g. a store being rewritten; the next round tries again
+                print(f"Answer cache: refresh failed: {str(e)}")
+
+    def stamp(self):
+        """Versions to pass to put() for an answer whose retrieval starts now"""
+        return self.versions.versions if self.versions is not None else None
+
+    def lookup(self, question: str, k: int):
+        """(answer, hits, similarity) of the most similar fresh cached question with at least k hits, or None"""
+        vector = self.embedder.embed([question])[0]
+        now = time.time()
+        with self.lock:
+            if self.entries:
+                scores = np.where(self.active, self.vectors @ vector, -np.inf)
+                for slot in np.argsort(-scores)[:8].tolist():  # Next best if the closest has expired
+                    if scores[slot] < self.threshold:
+                        break
+                    entry = self.entries[slot]
+                    if now - entry['created'] > self.ttl_seconds:
+                        self.remove(slot)
+                        continue
+                    if entry['k'] < k:
+                        continue  # Retrieved fewer hits than asked for
+                    self.entries.move_to_end(slot)
+                    self.hits += 1
+                    return entry['answer'], entry['hits'][:k], float(scores[slot])
+            self.misses += 1
+            return None
+
+    def put(self, question: str, answer: str, hits: List[Dict], k: int, stamp: Dict = None):
+        """Cache an answer; skipped when a cited video changed since `stamp` (from stamp())"""
+        vector = self.embedder.embed([question])[0]
+        video_ids = {hit['VideoID'] for hit in hits}
+        with self.lock:
+            # Checked under the lock: a refresh swaps versions before it invalidates, so an
+            # entry is either refused here or inserted in time to be invalidated
+            if stamp is not None and any(stamp.get(video_id) != self.versions.versions.get(video_id) for video_id in video_ids):
+                return
+            if self.vectors is None:
+                self.vectors = np.zeros((self.capacity, len(vector)), dtype=np.float32)
+            if not self.free_slots:
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+            slot = self.free_slots.pop()
+            self.vectors[slot] = vector
+            self.active[slot] = True
+            self.entries[slot] = {'question': question, 'answer': answer, 'hits': hits, 'k': k,
+                                  'video_ids': video_ids, 'created': time.time(),
+                                  'versions': {video_id: stamp.get(video_id) for video_id in video_ids} if stamp is not None else None}
+            for video_id in video_ids:
+                self.slots_by_video.setdefault(video_id, set()).add(slot)
+
+    def stats(self) -> Dict:
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'invalidations': self.invalidations}
+
+    def close(self):
+        self.stopped.set()
+
+class MicroBatcher:
+    """Collects concurrent queries into one retriever call.
+
+    Requests wait in a bounded queue; when it is full, submit() raises Overloaded at once
+    instead of letting latency grow without limit. Each worker takes the first waiting query,
+    gathers more for up to `max_wait` seconds (or until `max_batch`), and runs one batched
+    search in a thread so the event loop keeps accepting connections.
+    """
+    def __init__(self, retriever, max_batch: int = 32, max_wait: float = 0.002, queue_size: int = 1024, workers: int = 2):
+        self.retriever = retriever
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.tasks = [asyncio.create_task(self.worker()) for _ in range(workers)]
+        self.batches = 0
+        self.batched_queries = 0
+
+    async def submit(self, query: str, k: int) -> Dict:
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((query, k, future))
+        except asyncio.QueueFull:
+            raise Overloaded()
+        return await future
+
+    async def worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.batches += 1
+            self.batched_queries += len(batch)
+            queries = [query for query, _, _ in batch]
+            k = max(k for _, k, _ in batch)
+            try:
+                results = await loop.run_in_executor(self.executor, self.retriever.search, queries, k)
+                for (_, query_k, future), result in zip(batch, results):
+                    if not future.done():  # The client may have disconnected
+                        future.set_result(dict(result, hits=result['hits'][:query_k], batch_size=len(batch)))
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def close(self):
+        for task in self.tasks:
+            task.cancel()
+        self.executor.shutdown(wait=False)
+
+class ChatService:
+    """Question answering over the corpus: batched hybrid retrieval plus an optional LLM answer.
+
+    With an `answer_cache`, a question close enough to one answered before is served from
+    the cache, skipping both retrieval and the LLM call.
+
+    At most `llm_concurrency` answers are generated at once and `llm_queue_size` more may
+    wait for a slot; beyond that, answer requests are rejected with Overloaded before any
+    retrieval work is spent on them.
+    """
+    def __init__(self, retriever, backend=None, max_batch: int = 32, max_wait: float = 0.002, queue_size: int = 1024,
+                 batch_workers: int = 2, llm_concurrency: int = 8, max_k: int = 20, answer_cache: SemanticAnswerCache = None,
+                 llm_queue_size: int = 64):
+        self.retriever = retriever
+        self.backend = backend or StubBackend()
+        self.answer_cache = answer_cache
+        self.batcher_options = (max_batch, max_wait, queue_size, batch_workers)
+        self.batcher = None
+        self.llm_slots = None
+        self.llm_concurrency = llm_concurrency
+        self.llm_queue_size = llm_queue_size
+        self.llm_pending = 0  # Answer requests past the cache, running or waiting for a slot
+        self.llm_executor = ThreadPoolExecutor(max_workers=llm_concurrency)
+        # Cache lookups get their own threads, so a hit never waits behind running LLM calls
+        self.cache_executor = ThreadPoolExecutor(max_workers=2)
+        self.max_k = max_k
+        self.requests = 0
+        self.rejected = 0
+
+    async def start(self):
+        """Create the batcher inside the running event loop"""
+        self.batcher = MicroBatcher(self.retriever, *self.batcher_options)
+        self.llm_slots = asyncio.Semaphore(self.llm_concurrency)
+
+    async def query(self, question: str, k: int = 5, answer: bool = False) -> Dict:
+        self.requests += 1
+        loop = asyncio.get_running_loop()
+        k = min(max(1, k), self.max_k)
+        if answer and self.answer_cache is not None:
+            start = time.perf_counter()
+            cached = await loop.run_in_executor(self.cache_executor, self.answer_cache.lookup, question, k)
+            if cached is not None:
+                cached_answer, hits, similarity = cached
+                return {'question': question, 'answer': cached_answer, 'hits': hits, 'partial': False,
+                        'timings_ms': {'cache': (time.perf_counter() - start) * 1000}, 'batch_size': 0,
+                        'cached': True, 'similarity': similarity}
+
+        if answer:
+            if self.llm_pending >= self.llm_concurrency + self.llm_queue_size:
+                raise Overloaded()
+            self.llm_pending += 1
+        try:
+            return await self.retrieve_and_answer(question, k, answer)
+        finally:
+            if answer:
+                self.llm_pending -= 1
+
+    async def retrieve_and_answer(self, question: str, k: int, answer: bool) -> Dict:
+        loop = asyncio.get_running_loop()
+        stamp = self.answer_cache.stamp() if self.answer_cache is not None else None
+        result = await self.batcher.submit(question, k)
+        response = {
+            'question': question,
+            'answer': None,
+            'hits': [{key: hit[key] for key in ('VideoID', 'Title', 'URL', 'Timestamp', 'Score', 'Text')} for hit in result['hits']],
+            'partial': result['partial'],
+            'timings_ms': result['timings_ms'],
+            'batch_size': result['batch_size'],
+        }
+        if answer:
+            start = time.perf_counter()
+            async with self.llm_slots:
+                response['answer'] = await loop.run_in_executor(self.llm_executor, self.backend.answer, question, result['hits'])
+            response['timings_ms']['answer'] = (time.perf_counter() - start) * 1000
+            response['cached'] = False
+            # An answer from partial retrieval is not worth repeating to later askers
+            if self.answer_cache is not None and not response['partial']:
+                await loop.run_in_executor(self.cache_executor, self.answer_cache.put, question, response['answer'],
+                                           response['hits'], k, stamp)
+        return response
+
+    def stats(self) -> Dict:
+        batcher = self.batcher
+        return {
+            'requests': self.requests,
+            'rejected': self.rejected,
+            'queue_depth': batcher.queue.qsize() if batcher else 0,
+            'llm_pending': self.llm_pending,
+            'average_batch_size': batcher.batched_queries / batcher.batches if batcher and batcher.batches else None,
+            'retrieval': self.retriever.stats.summary(),
+            'answer_cache': self.answer_cache.stats() if self.answer_cache is not None else None,
+        }
+
+    async def handle(self, method: str, path: str, body: bytes) -> tuple:
+        """Route one request; returns (status, payload, extra headers)"""
+        if path == '/health':
+            return 200, {'status': 'ok'}, {}
+        if path == '/stats':
+            return 200, self.stats(), {}
+        if path != '/query':
+            return 404, {'error': f'no route {path}'}, {}
+        if method != 'POST':
+            return 405, {'error': 'use POST'}, {'Allow': 'POST'}
+        try:
+            request = json.loads(body or b'{}')
+            question = str(request['question']).strip()
+            k = int(request.get('k', 5))
+            answer = request.get('answer', False)
+        except (ValueError, KeyError, TypeError, OverflowError) as e:  # OverflowError: int(1e400)
+            return 400, {'error': f'expected {{"question": ..., "k": 5, "answer": false}}: {str(e)}'}, {}
+        if not question:
+            return 400, {'error': 'empty question'}, {}
+        if not isinstance(answer, bool):  # "false" would be truthy and buy an LLM call
+            return 400, {'error': '"answer" must be true or false'}, {}
+        try:
+            return 200, await self.query(question, k, answer), {}
+        except Overloaded:
+            self.rejected += 1
+            return 503, {'error': 'server busy'}, {'Retry-After': '1'}
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Minimal HTTP/1.1 with keep-alive: one request at a time per connection"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self.respond(writer, 400, {'error': 'malformed request line'}, {}, keep_alive=False)
+                    break
+                if len(request_line) > MAX_LINE_BYTES:
+                    await self.respond(writer, 400, {'error': 'request line too long'}, {}, keep_alive=False)
+                    break
+                headers = {}
+                header_lines = 0
+                header_error = None
+                while True:
+                    try:
+                        line = await reader.readline()
+                    except ValueError:  # Longer than the stream's buffer limit
+                        line = None
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    header_lines += 1
+                    if line is None or len(line) > MAX_LINE_BYTES:
+                        header_error = 'header line too long'
+                        break
+                    if header_lines > MAX_HEADER_LINES:
+                        header_error = f'more than {MAX_HEADER_LINES} header lines'
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if header_error:
+                    await self.respond(writer, 431, {'error': header_error}, {}, keep_alive=False)
+                    break
+                if 'transfer-encoding' in headers:
+                    # The body is not read, so the connection cannot be reused for a next request
+                    await self.respond(writer, 501, {'error': 'Transfer-Encoding is not supported; send Content-Length'}, {},
+                                       keep_alive=False)
+                    break
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                content_length = headers.get('content-length', '0')
+                if not (content_length.isascii() and content_length.isdigit()):
+                    await self.respond(writer, 400, {'error': 'invalid Content-Length'}, {}, keep_alive=False)
+                    break
+                length = int(content_length)
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, 413, {'error': 'request body too large'}, {}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                try:
+                    status, payload, extra_headers = await self.handle(method, path.split('?', 1)[0], body)
+                except Exception as e:
+                    print(f"Error handling {method} {path}: {str(e)}")
+                    status, payload, extra_headers = 500, {'error': 'internal error'}, {}
+                await self.respond(writer, status, payload, extra_headers, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # Disconnected, or a request line longer than the stream's buffer limit
+        finally:
+            writer.close()
+
+    async def respond(self, writer: asyncio.StreamWriter, status: int, payload: Dict, extra_headers: Dict, keep_alive: bool):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        headers = {'Content-Type': 'application/json; charset=utf-8', 'Content-Length': str(len(data)),
+                   'Connection': 'keep-alive' if keep_alive else 'close', **extra_headers}
+        head = f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n" + ''.join(f"{name}: {value}\r\n" for name, value in headers.items())
+        writer.write(head.encode('latin-1') + b'\r\n' + data)
+        await writer.drain()  # Backpressure from slow clients
+
+    def close(self):
+        if self.batcher:
+            self.batcher.close()
+        self.llm_executor.shutdown(wait=False)
+        self.cache_executor.shutdown(wait=False)
+        if self.answer_cache is not None:
+            self.answer_cache.close()
+
+async def serve(service: ChatService, host: str = '127.0.0.1', port: int = 8080):
+    await service.start()
+    server = await asyncio.start_server(service.serve_connection, host, port, backlog=1024)
+    print(f"Chat service listening on http://{host}:{port} (POST /query, GET /stats, GET /health)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+if __name__ == "__main__":
+    # Service settings
+    HOST = '127.0.0.1'
+    PORT = 8080
+    MAX_BATCH = 32  # Queries per retriever call
+    MAX_WAIT = 0.002  # Seconds a query may wait for others to join its batch
+    QUEUE_SIZE = 1024  # Waiting queries beyond this get 503 + Retry-After
+    LLM_CONCURRENCY = 8  # Answers generated at once
+    LLM_QUEUE_SIZE = 64  # Answer requests waiting for the LLM beyond this get 503 + Retry-After
+    BATCH_WORKERS = 2  # Batches searched concurrently
+    BUDGET_SECONDS = 0.25  # Retrieval latency budget per batch (see 03_hybrid_search.py)
+    USE_OPENAI = False  # True answers with OPENAI_API_KEY; False uses the offline stub
+    CACHE_THRESHOLD = 0.9  # Cosine similarity for two questions to share an answer; None disables the cache
+    CACHE_TTL_SECONDS = 24 * 3600
+    CACHE_CAPACITY = 4096  # Answers kept; least recently used are evicted beyond this
+    TRANSCRIPT_STORE = os.path.join(script_dir, '..', '01_Download Transcript by Youtube API', '04_transcripts.jsonl')
+    RESULTS_DB = os.path.join(script_dir, '..', '02_Analyze by GPT-4o API', 'analysis_results.sqlite')
+
+    backend = None
+    if USE_OPENAI:
+        from dotenv import load_dotenv
+        load_dotenv()
+        backend = OpenAIBackend(os.getenv('OPENAI_API_KEY'))
+
+    # Room for the legs of every concurrent batch plus as many again for legs that overran the budget
+    retriever = hybrid_search.open_retriever(script_dir, budget_seconds=BUDGET_SECONDS,
+                                             max_workers=2 * len(hybrid_search.LEGS) * BATCH_WORKERS)
+    answer_cache = None
+    if CACHE_THRESHOLD is not None:
+        # Cached answers citing a re-downloaded or re-analyzed video are dropped
+        answer_cache = SemanticAnswerCache(retriever.vectors.embedder, CACHE_THRESHOLD, CACHE_TTL_SECONDS, CACHE_CAPACITY,
+                                           VideoVersions(TRANSCRIPT_STORE, RESULTS_DB))
+    service = ChatService(retriever, backend, MAX_BATCH, MAX_WAIT, QUEUE_SIZE, BATCH_WORKERS, LLM_CONCURRENCY,
+                          answer_cache=answer_cache, llm_queue_size=LLM_QUEUE_SIZE)
+    try:
+        asyncio.run(serve(service, HOST, PORT))
+    except KeyboardInterrupt:
+        print("Shutting down.")
+    finally:
+        retriever.close()
@@ -0,0 +1,249 @@
+import os
+import sys
+import csv
+import json
+import tempfile
+import threading
+import importlib
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '02_Analyze by GPT-4o API'))
+analyze = importlib.import_module('01_analyzeTranscripts')
+
+class RepairAnalysisTest(unittest.TestCase):
+    def test_trailing_commas_are_removed_outside_strings_only(self):
+        reply = ('{"Electrical_Terms": ["has } brace, ]", "quote \\" ,]",], "Problems_Challenges": [],'
+                 ' "Tools_Equipment": [], "Educational_Content": [],}')
+        analysis = json.loads(analyze.repair_analysis(reply))
+        self.assertEqual(analysis['Electrical_Terms'], ['has } brace, ]', 'quote " ,]'])
+        self.assertEqual(analysis['Tools_Equipment'], [])
+
+    def test_fenced_reply_with_trailing_text(self):
+        reply = ('Here you go:\n```json\n{"Electrical_Terms": ["GFCI",], "Problems_Challenges": [],\n'
+                 '"Tools_Equipment": [], "Educational_Content": []\n}\n```\nAnything else?')
+        self.assertEqual(json.loads(analyze.repair_analysis(reply))['Electrical_Terms'], ['GFCI'])
+
+    def test_unknown_or_missing_categories_are_schema_errors(self):
+        with self.assertRaisesRegex(ValueError, 'unexpected keys Problems'):
+            analyze.repair_analysis('{"Electrical_Terms": ["a"], "Problems": ["lost"]}')
+        with self.assertRaisesRegex(ValueError, 'missing keys Problems_Challenges, Tools_Equipment'):
+            analyze.repair_analysis('{"Electrical_Terms": ["a"], "Educational_Content": []}')
+        reply = {'choices': [{'message': {'content': '{"Electrical_Terms": ["a"], "Problems": ["lost"]}'}}]}
+        self.assertTrue(analyze.extract_analysis(reply).startswith('Schema Error:'))
+
+class ResultWriterTest(unittest.TestCase):
+    def test_rows_wait_for_the_store_commit(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        output_file = os.path.join(tmp.name, 'analysis.csv')
+        progress = analyze.ProgressBitmap(os.path.join(tmp.name, 'progress.bin'))
+        store = analyze.ResultStore(os.path.join(tmp.name, 'results.db'), batch_size=3)
+        results = analyze.ResultWriter(output_file, progress, analyze.FailureLog(output_file), store)
+        analysis = json.dumps({key: ['item'] for key in analyze.CATEGORY_COLUMNS})
+
+        def csv_ids():
+            with open(output_file, 'r', newline='', encoding='utf-8') as csvfile:
+                return [row['VideoID'] for row in csv.DictReader(csvfile)]
+
+        results.record(1, 'Video 1', 'url1', analysis)
+        results.record_short(2, 'Video 2', 'url2')
+        # A hard kill here loses nothing the next run would not redo: no rows, no bits
+        self.assertEqual(csv_ids(), [])
+        self.assertEqual(progress.load_range(1, 3), set())
+
+        results.record(3, 'Video 3', 'url3', 'Error: boom')  # Fills the store batch, which commits
+        self.assertEqual(csv_ids(), ['1', '2'])
+        self.assertEqual(progress.load_range(1, 3), {1, 2})
+        results.close()
+
+class FakeBatchServer(BaseHTTPRequestHandler):
+    """Local stand-in for the OpenAI files and batches endpoints.
+
+    A batch reports in_progress on its first poll and completed on the next. Each request's
+    reply names its custom_id as the only electrical term, so merged chunks can be checked;
+    requests whose custom_id is in `failing` come back in the batch's error file, those in
+    `rejected` get a 400 response and those in `refusing` a reply with null content.
+    """
+    state = None
+    lock = threading.Lock()  # Shards upload and submit concurrently
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, body, status=200):
+        data = (body if isinstance(body, str) else json.dumps(body)).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        with self.lock:
+            self.handle_post(body)
+
+    def handle_post(self, body):
+        state = self.state
+        if self.path == '/v1/files':
+            # Keep the JSONL lines of the multipart upload; the form boundaries are not JSON
+            lines = [json.loads(line) for line in body.decode('utf-8').splitlines() if line.startswith('{')]
+            state['uploads'].append(lines)
+            return self.reply({'id': f"file-{len(state['uploads']) - 1}"})
+        if self.path == '/v1/batches':
+            lines = state['uploads'][int(json.loads(body)['input_file_id'].split('-')[1])]
+            batch_id = f"batch-{len(state['batches'])}"
+            output, errors = [], []
+            for line in lines:
+                if line['custom_id'] in state['failing']:
+                    errors.append({'custom_id': line['custom_id'], 'response': None, 'error': {'message': 'boom'}})
+                elif line['custom_id'] in state['rejected']:
+                    errors.append({'custom_id': line['custom_id'], 'error': None, 'response': {
+                        'status_code': 400, 'body': {'error': {'code': 'context_length_exceeded'}}}})
+                else:
+                    content = json.dumps({'Electrical_Terms': [line['custom_id']], 'Problems_Challenges': [],
+                                          'Tools_Equipment': [], 'Educational_Content': []})
+                    if line['custom_id'] in state['refusing']:
+                        content = None
+                    output.append({'custom_id': line['custom_id'], 'error': None, 'response': {
+                        'status_code': 200, 'body': {'choices': [{'message': {'content': content}}]}}})
+            state['files'][f'{batch_id}-output'] = '\n'.join(json.dumps(line) for line in output)
+            state['files'][f'{batch_id}-errors'] = '\n'.join(json.dumps(line) for line in errors)
+            state['batches'][batch_id] = {'id': batch_id, 'status': 'in_progress', 'polls': 0,
+                                          'output_file_id': f'{batch_id}-output', 'error_file_id': f'{batch_id}-errors'}
+            return self.reply(state['batches'][batch_id])
+        self.reply({}, 404)
+
+    def do_GET(self):
+        state = self.state
+        if self.path.startswith('/v1/batches/'):
+            if state['poll_failures']:
+                state['poll_failures'] -= 1
+                return self.reply({'error': 'unavailable'}, 400)
+            batch = state['batches'][self.path.rsplit('/', 1)[1]]
+            batch['polls'] += 1
+            if batch['polls'] >= 2:
+                batch['status'] = 'completed'
+            return self.reply(batch)
+        if self.path.startswith('/v1/files/') and self.path.endswith('/content'):
+            return self.reply(state['files'][self.path.split('/')[3]])
+        self.reply({}, 404)
+
+class BatchFlowTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        FakeBatchServer.state = self.state = {'uploads': [], 'batches': {}, 'files': {}, 'failing': set(), 'refusing': set(),
+                                                'rejected': set(), 'poll_failures': 0}
+        server = ThreadingHTTPServer(('127.0.0.1', 0), FakeBatchServer)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.api_base_url = f'http://127.0.0.1:{server.server_address[1]}/v1'
+
+        self.input_file = os.path.join(self.tmp.name, 'transcripts.jsonl')
+        self.output_file = os.path.join(self.tmp.name, 'analysis.csv')
+        self.long_transcript = ' '.join(f'word{i}' for i in range(600))
+        with open(self.input_file, 'w', encoding='utf-8') as jsonfile:
+            for video_id in range(1, 5):
+                transcript = self.long_transcript if video_id == 4 else f'transcript of video {video_id} ' * 10
+                jsonfile.write(json.dumps({'VideoID': video_id, 'Title': f'Video {video_id}', 'URL': f'url{video_id}',
+                                           'Transcript': transcript}) + '\n')
+
+    def run_batch(self):
+        analyze.process_videos(1, 4, self.input_file, self.output_file, 'test-key', 'gpt-4o-mini', 5,
+                               use_batch_api=True, api_base_url=self.api_base_url, poll_interval=0,
+                               chunk_max_tokens=500, chunk_overlap_tokens=20, max_retries=0)
+
+    def read_rows(self):
+        with open(self.output_file, 'r', newline='', encoding='utf-8') as csvfile:
+            return {row['VideoID']: row for row in csv.DictReader(csvfile)}
+
+    def test_submit_poll_and_merge(self):
+        self.state['failing'] = {'video-2-0'}
+        self.run_batch()
+
+        num_chunks = len(analyze.chunk_transcript(self.long_transcript, 500, 20))
+        self.assertGreater(num_chunks, 1)
+        uploaded = [line['custom_id'] for line in self.state['uploads'][0]]
+        self.assertEqual(uploaded, ['video-1-0', 'video-2-0', 'video-3-0'] + [f'video-4-{i}' for i in range(num_chunks)])
+        self.assertEqual(self.state['batches']['batch-0']['polls'], 2)
+
+        rows = self.read_rows()
+        self.assertEqual(sorted(rows), ['1', '3', '4'])  # The failed video is only in the failure log
+        self.assertEqual(rows['1']['Electrical Terms'], 'video-1-0')
+        self.assertEqual(rows['4']['Electrical Terms'], ', '.join(f'video-4-{i}' for i in range(num_chunks)))
+        self.assertEqual([row['VideoID'] for row in analyze.FailureLog(self.output_file).load()], ['2'])
+        self.assertFalse(os.path.exists(f"{os.path.splitext(self.output_file)[0]}_batch.json"))
+
+        # The rerun only submits the failed video
+        self.state['failing'] = set()
+        self.run_batch()
+        self.assertEqual([line['custom_id'] for line in self.state['uploads'][1]], ['video-2-0'])
+        self.assertEqual(sorted(self.read_rows()), ['1', '2', '3', '4'])
+
+    def test_rerun_only_requests_the_chunks_that_failed(self):
+        cache_file = os.path.join(self.tmp.name, 'cache.sqlite')
+        self.state['failing'] = {'video-4-1'}
+        analyze.process_videos(1, 4, self.input_file, self.output_file, 'test-key', 'gpt-4o-mini', 5,
+                               use_batch_api=True, api_base_url=self.api_base_url, poll_interval=0,
+                               chunk_max_tokens=500, chunk_overlap_tokens=20, max_retries=0, cache_file=cache_file)
+        self.assertEqual([row['VideoID'] for row in analyze.FailureLog(self.output_file).load()], ['4'])
+
+        self.state['failing'] = set()
+        analyze.process_videos(1, 4, self.input_file, self.output_file, 'test-key', 'gpt-4o-mini', 5,
+                               use_batch_api=True, api_base_url=self.api_base_url, poll_interval=0,
+                               chunk_max_tokens=500, chunk_overlap_tokens=20, max_retries=0, cache_file=cache_file)
+        self.assertEqual([line['custom_id'] for line in self.state['uploads'][1]], ['video-4-1'])
+        num_chunks = len(analyze.chunk_transcript(self.long_transcript, 500, 20))
+        self.assertEqual(self.read_rows()['4']['Electrical Terms'], ', '.join(f'video-4-{i}' for i in range(num_chunks)))
+
+    def test_refused_reply_only_fails_its_own_video(self):
+        self.state['refusing'] = {'video-3-0'}
+        self.run_batch()
+        self.assertEqual(sorted(self.read_rows()), ['1', '2', '4'])
+        failures = analyze.FailureLog(self.output_file).load()
+        self.assertEqual([row['VideoID'] for row in failures], ['3'])
+        self.assertTrue(failures[0]['Error'].startswith('Error: no analysis in reply'))
+        self.assertFalse(os.path.exists(f"{os.path.splitext(self.output_file)[0]}_batch.json"))
+
+    def test_permanent_failure_is_not_resubmitted(self):
+        self.state['rejected'] = {'video-3-0'}
+        self.run_batch()
+        failures = analyze.FailureLog(self.output_file).load()
+        self.assertEqual([(row['VideoID'], row['Kind']) for row in failures], [('3', 'permanent')])
+
+        self.run_batch()
+        self.assertEqual(len(self.state['uploads']), 1)  # Nothing left worth submitting
+        self.assertEqual(sorted(self.read_rows()), ['1', '2', '4'])
+
+    def test_sharded_run_skips_videos_done_in_a_legacy_output(self):
+        with open(self.output_file, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=['VideoID', 'Title', 'URL'] + list(analyze.CATEGORY_COLUMNS.values()))
+            writer.writeheader()
+            writer.writerow(analyze.placeholder_row(1, 'Video 1', 'url1', 'done earlier'))
+            writer.writerow(analyze.placeholder_row(2, 'Video 2', 'url2', 'Error in analysis'))
+        analyze.run_sharded(2, 1, 4, self.input_file, self.output_file, 'test-key', 'gpt-4o-mini', 5,
+                            use_batch_api=True, api_base_url=self.api_base_url, poll_interval=0,
+                            chunk_max_tokens=500, chunk_overlap_tokens=20, max_retries=0)
+
+        uploaded = sorted(line['custom_id'] for lines in self.state['uploads'] for line in lines)
+        self.assertNotIn('video-1-0', uploaded)
+        self.assertIn('video-2-0', uploaded)
+        rows = self.read_rows()
+        self.assertEqual(sorted(rows), ['1', '2', '3', '4'])
+        self.assertEqual(rows['1']['Electrical Terms'], 'done earlier')
+        self.assertEqual(rows['2']['Electrical Terms'], 'video-2-0')
+
+    def test_interrupted_poll_resumes_the_same_batch(self):
+        self.state['poll_failures'] = 1
+        with self.assertRaises(analyze.requests.HTTPError):
+            self.run_batch()
+        self.assertTrue(os.path.exists(f"{os.path.splitext(self.output_file)[0]}_batch.json"))
+
+        self.run_batch()
+        self.assertEqual(len(self.state['batches']), 1)
+        self.assertEqual(sorted(self.read_rows()), ['1', '2', '3', '4'])
+
+if __name__ == '__main__':
+    unittest.main()
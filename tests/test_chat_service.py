@@ -0,0 +1,113 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import importlib
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '04_Chatbot Retrieval'))
+chat_service = importlib.import_module('04_chat_service')
+vector_index = chat_service.hybrid_search.vector_index
+
+def hits_for(*video_ids):
+    return [{'VideoID': video_id, 'Title': f'Video {video_id}', 'Text': f'excerpt {video_id}'} for video_id in video_ids]
+
+class SemanticAnswerCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store_path = os.path.join(self.tmp.name, 'transcripts.jsonl')
+        self.mtime = time.time()
+        self.write_store({1: 'wire the gfci outlet', 2: 'bend the conduit'})
+
+    def write_store(self, transcripts):
+        with vector_index.download_transcript.TranscriptStore(self.store_path).open('w') as store:
+            for video_id, transcript in transcripts.items():
+                store.append({'VideoID': str(video_id), 'Title': f'Video {video_id}', 'URL': '', 'Transcript': transcript})
+        # A later modification time than the previous write, whatever the file system's resolution
+        self.mtime += 10
+        for path in (self.store_path, vector_index.download_transcript.TranscriptStore(self.store_path).index_path):
+            os.utime(path, (self.mtime, self.mtime))
+
+    def make_cache(self, **options):
+        cache = chat_service.SemanticAnswerCache(vector_index.HashingEmbedder(256), **options)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_entries_expire_after_their_ttl(self):
+        cache = self.make_cache(ttl_seconds=60)
+        cache.put('how to wire a gfci', 'answer', hits_for(1), k=1)
+        self.assertIsNotNone(cache.lookup('how to wire a gfci', 1))
+        cache.entries[next(iter(cache.entries))]['created'] -= 61
+        self.assertIsNone(cache.lookup('how to wire a gfci', 1))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_hits_are_cut_to_k_and_smaller_entries_do_not_serve_larger_k(self):
+        cache = self.make_cache()
+        cache.put('how to wire a gfci', 'answer', hits_for(1, 2, 3), k=3)
+        answer, hits, similarity = cache.lookup('how to wire a gfci', 2)
+        self.assertEqual([hit['VideoID'] for hit in hits], [1, 2])
+        self.assertAlmostEqual(similarity, 1.0, places=5)
+        self.assertIsNone(cache.lookup('how to wire a gfci', 4))
+
+    def test_changed_video_invalidates_the_entries_citing_it(self):
+        cache = self.make_cache(versions=chat_service.VideoVersions(self.store_path), refresh_seconds=3600)
+        cache.put('how to wire a gfci', 'answer 1', hits_for(1), k=1, stamp=cache.stamp())
+        cache.put('how to bend conduit', 'answer 2', hits_for(2), k=1, stamp=cache.stamp())
+
+        self.write_store({1: 'wire the gfci outlet', 2: 'bend the conduit with a hand bender'})
+        cache.refresh()
+        self.assertIsNotNone(cache.lookup('how to wire a gfci', 1))
+        self.assertIsNone(cache.lookup('how to bend conduit', 1))
+        self.assertEqual(cache.stats()['invalidations'], 1)
+
+    def test_answer_built_before_a_change_is_not_stored(self):
+        cache = self.make_cache(versions=chat_service.VideoVersions(self.store_path), refresh_seconds=3600)
+        stamp = cache.stamp()  # Retrieval starts
+        self.write_store({1: 'wire the gfci outlet', 2: 'bend the conduit with a hand bender'})
+        cache.refresh()  # The change lands before the answer is ready
+        cache.put('how to bend conduit', 'stale answer', hits_for(2), k=1, stamp=stamp)
+        cache.put('how to wire a gfci', 'answer', hits_for(1), k=1, stamp=stamp)
+        self.assertIsNone(cache.lookup('how to bend conduit', 1))
+        self.assertIsNotNone(cache.lookup('how to wire a gfci', 1))
+
+class HandleTest(unittest.TestCase):
+    def setUp(self):
+        self.service = chat_service.ChatService(retriever=None)
+        self.addCleanup(self.service.close)
+
+    def post(self, body: bytes) -> tuple:
+        status, payload, _ = asyncio.run(self.service.handle('POST', '/query', body))
+        return status, payload
+
+    def test_malformed_fields_are_bad_requests(self):
+        for body in (b'{"question": "gfci", "k": 1e400}', b'{"question": "gfci", "k": "many"}', b'{"k": 3}', b'[1]'):
+            self.assertEqual(self.post(body)[0], 400, body)
+
+    def test_answer_must_be_a_json_boolean(self):
+        status, payload = self.post(b'{"question": "gfci", "answer": "false"}')
+        self.assertEqual(status, 400)
+        self.assertIn('true or false', payload['error'])
+
+    def test_chunked_body_is_rejected_and_the_connection_closed(self):
+        async def exchange():
+            server = await asyncio.start_server(self.service.serve_connection, '127.0.0.1', 0)
+            async with server:
+                reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+                body = b'{"question": "gfci"}'
+                writer.write(b'POST /query HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n'
+                             + f'{len(body):x}\r\n'.encode() + body + b'\r\n0\r\n\r\n')
+                await writer.drain()
+                response = await asyncio.wait_for(reader.read(), 5)  # Returns at EOF, once the server closes
+                writer.close()
+                return response
+
+        head, _, data = asyncio.run(exchange()).partition(b'\r\n\r\n')
+        self.assertTrue(head.startswith(b'HTTP/1.1 501 '))
+        self.assertIn(b'Connection: close', head)
+        self.assertIn('Transfer-Encoding', json.loads(data)['error'])
+
+if __name__ == '__main__':
+    unittest.main()
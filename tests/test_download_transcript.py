@@ -0,0 +1,75 @@
+import os
+import sys
+import csv
+import time
+import random
+import tempfile
+import importlib
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '01_Download Transcript by Youtube API'))
+download_transcript = importlib.import_module('03_download_transcript')
+
+class StubTranscripts:
+    """Stand-in for YouTubeTranscriptApi.get_transcript with random latency per call"""
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.calls = []
+
+    def __call__(self, youtube_id, languages=None):
+        self.calls.append(youtube_id)
+        time.sleep(random.uniform(0, 0.02))  # Downloads finish out of order
+        if youtube_id in self.missing:
+            raise download_transcript.TranscriptsDisabled(youtube_id)
+        return [{'text': f'{youtube_id} part one', 'start': 0.0, 'duration': 2.5},
+                {'text': f'{youtube_id} part two', 'start': 2.5, 'duration': 3.0}]
+
+class ProcessCsvToJsonTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.input_file = os.path.join(self.tmp.name, 'video_URL.csv')
+        self.output_file = os.path.join(self.tmp.name, 'transcripts.jsonl')
+        with open(self.input_file, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['VideoID', 'Title', 'URL', 'Keyword'])
+            for i in range(1, 21):
+                writer.writerow([i, f'Video {i}', f'https://www.youtube.com/watch?v=yt{i}', 'kw'])
+
+    def test_concurrent_downloads_are_stored_in_input_order(self):
+        stub = StubTranscripts(missing={'yt7'})
+        download_transcript.process_csv_to_json(self.input_file, self.output_file, max_workers=8,
+                                                requests_per_second=1000, fetch_transcript=stub)
+
+        store = download_transcript.TranscriptStore(self.output_file)
+        records = list(store)
+        self.assertEqual([record['VideoID'] for record in records], [str(i) for i in range(1, 21) if i != 7])
+        self.assertEqual(records[0]['Transcript'], 'yt1 part one yt1 part two')
+        self.assertEqual(records[0]['Segments']['offset'], [0, len('yt1 part one') + 1])
+        self.assertEqual(store.get('20')['URL'], 'https://www.youtube.com/watch?v=yt20')
+        self.assertIn('7', download_transcript.MissingTranscriptLog(self.output_file).load())
+
+    def test_incremental_run_only_requests_new_videos(self):
+        download_transcript.process_csv_to_json(self.input_file, self.output_file, requests_per_second=1000,
+                                                fetch_transcript=StubTranscripts(missing={'yt7'}))
+        stub = StubTranscripts()
+        download_transcript.process_csv_to_json(self.input_file, self.output_file, requests_per_second=1000,
+                                                fetch_transcript=stub)
+        self.assertEqual(stub.calls, [])  # yt7 is known missing until its retry-after time
+
+    def test_append_after_torn_write_starts_a_new_line(self):
+        download_transcript.process_csv_to_json(self.input_file, self.output_file, requests_per_second=1000,
+                                                fetch_transcript=StubTranscripts(missing={'yt7'}))
+        with open(self.output_file, 'ab') as storefile:
+            storefile.write(b'{"VideoID": "21", "Title": "torn')  # Interrupted mid-record
+        with open(self.input_file, 'a', newline='', encoding='utf-8') as csvfile:
+            csv.writer(csvfile).writerow([21, 'Video 21', 'https://www.youtube.com/watch?v=yt21', 'kw'])
+        download_transcript.process_csv_to_json(self.input_file, self.output_file, requests_per_second=1000,
+                                                fetch_transcript=StubTranscripts())
+
+        store = download_transcript.TranscriptStore(self.output_file)
+        self.assertEqual([record['VideoID'] for record in store][-2:], ['20', '21'])
+        self.assertEqual(store.get('21')['Title'], 'Video 21')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+import os
+import sys
+import csv
+import time
+import random
+import tempfile
+import importlib
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '01_Download Transcript by Youtube API'))
+download_url = importlib.import_module('01_download_URL')
+
+VIDEO_DETAILS = {
+    'snippet': {'description': 'desc', 'tags': ['a'], 'categoryId': '27'},
+    'statistics': {'viewCount': '10', 'likeCount': '2', 'commentCount': '1'},
+    'contentDetails': {'duration': 'PT4M13S'},
+}
+
+class FakeRequest:
+    def __init__(self, client, method, params):
+        self.client = client
+        self.method = method
+        self.params = params
+
+    def execute(self):
+        return self.client.execute(self.method, self.params)
+
+class FakeResource:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def list(self, **params):
+        return FakeRequest(self.client, f'{self.name}.list', params)
+
+class FakeYouTube:
+    """Canned search pages per keyword: pages[keyword] is a list of pages of (video_id, title).
+
+    Every call sleeps for a random moment, so concurrent keywords finish out of order.
+    The next `failures[method]` calls of a method raise a 503 HttpError.
+    """
+    def __init__(self, pages, failures=None):
+        self.pages = pages
+        self.failures = dict(failures or {})
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def search(self):
+        return FakeResource(self, 'search')
+
+    def videos(self):
+        return FakeResource(self, 'videos')
+
+    def execute(self, method, params):
+        with self.lock:
+            self.calls.append((method, params))
+            failing = self.failures.get(method, 0) > 0
+            if failing:
+                self.failures[method] -= 1
+        time.sleep(random.uniform(0, 0.02))
+        if failing:
+            raise download_url.HttpError(SimpleNamespace(status=503, reason='Service Unavailable'), b'backend error')
+        if method == 'videos.list':
+            assert 'maxResults' not in params
+            return {'items': [dict(VIDEO_DETAILS, id=video_id) for video_id in params['id'].split(',')]}
+        page = int(params['pageToken'] or 0)
+        keyword_pages = self.pages[params['q']]
+        items = [{'id': {'videoId': video_id}, 'snippet': {'title': title}} for video_id, title in keyword_pages[page]]
+        response = {'items': items}
+        if page + 1 < len(keyword_pages):
+            response['nextPageToken'] = str(page + 1)
+        return response
+
+def electrical_pages(prefix, num_pages, per_page=3):
+    return [[(f'{prefix}{page}{i}', f'Electrical video {prefix}{page}{i}') for i in range(per_page)] for page in range(num_pages)]
+
+class CollectVideosTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_concurrent_crawl_keeps_keyword_order_and_deduplicates(self):
+        pages = {'kw1': electrical_pages('a', 2), 'kw2': electrical_pages('b', 2), 'kw3': electrical_pages('a', 1)}
+        pages['kw1'][0].append(('x1', 'Cooking show'))  # Fails the title filter
+        client = FakeYouTube(pages)
+        videos = download_url.collect_videos(client, ['kw1', 'kw2', 'kw3'], 100, 10000, max_workers=3, requests_per_second=1000)
+
+        keywords = [keyword for _, _, keyword, _ in videos]
+        self.assertEqual(keywords, sorted(keywords))  # Grouped in keyword order
+        urls = [url for _, url, _, _ in videos]
+        self.assertEqual(len(urls), len(set(urls)))
+        self.assertEqual(len(videos), 12)  # kw3's only page repeats kw1's first page
+        self.assertNotIn('https://www.youtube.com/watch?v=x1', urls)
+        # One batched details call per search page, never one per video
+        methods = [method for method, _ in client.calls]
+        self.assertEqual(methods.count('search.list'), 5)
+        self.assertEqual(methods.count('videos.list'), 4)
+
+    def test_budget_exhaustion_stops_crawl_and_keeps_checkpoint_resumable(self):
+        client = FakeYouTube({'kw1': electrical_pages('a', 5), 'kw2': electrical_pages('b', 5)})
+        checkpoint = download_url.CrawlCheckpoint(os.path.join(self.tmp.name, 'checkpoint.json'))
+        # Two search pages plus their details calls fit; the third page is refused up front
+        videos = download_url.collect_videos(client, ['kw1', 'kw2'], 100, 2 * download_url.SEARCH_PAGE_COST + 50,
+                                             max_workers=1, requests_per_second=1000, checkpoint=checkpoint)
+
+        self.assertEqual(len(videos), 6)
+        self.assertEqual(sum(method == 'search.list' for method, _ in client.calls), 2)
+        saved = download_url.CrawlCheckpoint.load(checkpoint.path)
+        self.assertFalse(saved.get('kw1')['done'])
+        self.assertEqual(saved.get('kw1')['next_page_token'], '2')
+        self.assertFalse(saved.get('kw2')['done'])
+
+    def test_failed_details_call_keeps_its_page_for_resume(self):
+        client = FakeYouTube({'kw1': electrical_pages('a', 2)}, failures={'videos.list': 1})
+        checkpoint = download_url.CrawlCheckpoint(os.path.join(self.tmp.name, 'checkpoint.json'))
+        videos = download_url.collect_videos(client, ['kw1'], 100, 10000, requests_per_second=1000, checkpoint=checkpoint)
+        self.assertEqual(videos, [])
+        self.assertFalse(checkpoint.get('kw1')['done'])
+        self.assertIsNone(checkpoint.get('kw1')['next_page_token'])
+
+        videos = download_url.collect_videos(client, ['kw1'], 100, 10000, requests_per_second=1000, checkpoint=checkpoint)
+        self.assertEqual(len(videos), 6)  # Page 0's videos were released, not lost
+        self.assertTrue(checkpoint.get('kw1')['done'])
+
+    def test_details_unit_is_held_for_the_search_that_reserved_it(self):
+        budget = download_url.QuotaBudget(download_url.SEARCH_PAGE_COST)
+        self.assertTrue(budget.try_spend('search.list', reserve=download_url.API_UNIT_COSTS['videos.list']))
+        self.assertFalse(budget.try_spend('videos.list'))  # Another thread cannot take the held unit
+        budget.spend_held('videos.list')
+        self.assertEqual(budget.remaining(), 0)
+
+    def test_quota_ledger_carries_spent_units_into_the_next_run(self):
+        ledger = os.path.join(self.tmp.name, 'quota.json')
+        client = FakeYouTube({'kw1': electrical_pages('a', 1)})
+        download_url.collect_videos(client, ['kw1'], 100, 10000, requests_per_second=1000, quota_ledger=ledger)
+        self.assertEqual(download_url.QuotaBudget(10000, ledger).remaining(), 10000 - download_url.SEARCH_PAGE_COST)
+
+class MainTest(unittest.TestCase):
+    def run_main(self, tmp, client, quota_limit, resume=False):
+        settings = dict(PLAN_ONLY=False, MAX_WORKERS=2, REQUESTS_PER_SECOND=1000,
+                        API_SERVICE_NAME='youtube', API_VERSION='v3', YOUTUBE_API_KEY='test')
+        with mock.patch.multiple(download_url, create=True, build=lambda *args, **kwargs: client, **settings):
+            download_url.main(os.path.join(tmp, 'catalog.csv'), ['kw1', 'kw2'], 100, quota_limit, resume)
+
+    def test_checkpoint_kept_until_every_keyword_finishes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            client = FakeYouTube({'kw1': electrical_pages('a', 3), 'kw2': electrical_pages('b', 1)})
+            checkpoint_path = os.path.join(tmp, 'catalog_checkpoint.json')
+            self.run_main(tmp, client, 2 * download_url.SEARCH_PAGE_COST)
+            self.assertTrue(os.path.exists(checkpoint_path))
+
+            os.remove(os.path.join(tmp, 'catalog_quota.json'))  # A new quota day
+            self.run_main(tmp, client, 10000, resume=True)
+            self.assertFalse(os.path.exists(checkpoint_path))
+            with open(os.path.join(tmp, 'catalog.csv'), 'r', newline='', encoding='utf-8') as csvfile:
+                rows = list(csv.DictReader(csvfile))
+            self.assertEqual(len(rows), 12)
+            self.assertEqual(len({row['URL'] for row in rows}), 12)
+
+class CatalogIndexTest(unittest.TestCase):
+    def test_rows_appended_without_index_rows_keep_their_ids(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            catalog = os.path.join(tmp, 'catalog.csv')
+            details = download_url.parse_video_item(VIDEO_DETAILS)
+            download_url.save_to_csv([('t1', 'https://www.youtube.com/watch?v=a', 'k', details)], catalog)
+            # A save interrupted after the catalog write but before the index write
+            with open(catalog, 'a', newline='', encoding='utf-8') as csvfile:
+                csv.DictWriter(csvfile, fieldnames=download_url.CATALOG_FIELDNAMES).writerow(
+                    {'VideoID': 2, 'Title': 't2', 'URL': 'https://www.youtube.com/watch?v=b', 'Description': 'two\nlines'})
+            download_url.save_to_csv([('t2', 'https://www.youtube.com/watch?v=b', 'k', details),
+                                      ('t3', 'https://www.youtube.com/watch?v=c', 'k', details)], catalog)
+
+            with open(catalog, 'r', newline='', encoding='utf-8') as csvfile:
+                rows = [(row['VideoID'], row['URL'][-1]) for row in csv.DictReader(csvfile)]
+            self.assertEqual(rows, [('1', 'a'), ('2', 'b'), ('3', 'c')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import sys
+import math
+import tempfile
+import importlib
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '04_Chatbot Retrieval'))
+vector_index = importlib.import_module('01_build_vector_index')
+bm25_index = importlib.import_module('02_build_bm25_index')
+
+def transcript_record(video_id, transcript):
+    return {'VideoID': str(video_id), 'Title': f'Video {video_id}', 'URL': f'https://www.youtube.com/watch?v=yt{video_id}',
+            'Transcript': transcript}
+
+class VectorIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.directory = os.path.join(self.tmp.name, 'vector_index')
+
+    def test_changed_transcript_is_reported_until_rebuild(self):
+        index = vector_index.VectorIndex(self.directory)
+        index.build([transcript_record(1, 'wire the gfci outlet'), transcript_record(2, 'bend the conduit')])
+        self.assertEqual(index.changed_videos, [])
+
+        records = [transcript_record(1, 'wire the gfci outlet'), transcript_record(2, 'pull the wire through conduit')]
+        index = vector_index.VectorIndex(self.directory)
+        self.assertEqual(index.build(records), 0)
+        self.assertEqual(index.changed_videos, [2])
+
+        index.build(records, rebuild=True)
+        self.assertEqual(index.changed_videos, [])
+        hits = index.open().search(['pull the wire'], k=1)[0]
+        self.assertEqual((hits[0]['VideoID'], hits[0]['Text']), (2, 'pull the wire through conduit'))
+
+class BM25IndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.vectors = vector_index.VectorIndex(os.path.join(self.tmp.name, 'vector_index'))
+        self.directory = os.path.join(self.tmp.name, 'bm25_index')
+        self.records = [transcript_record(1, 'conduit bending with a hand bender'),
+                        transcript_record(2, 'wire the gfci outlet then test the gfci'),
+                        transcript_record(3, 'strip the wire and land it on the breaker')]
+        self.vectors.build(self.records)
+
+    def test_scores_match_okapi_bm25(self):
+        index = bm25_index.BM25Index(self.directory, self.vectors)
+        index.build()
+        rows = index.search_rows('gfci', k=5)
+        self.assertEqual([row for row, _ in rows], [1])
+
+        lengths = [len(vector_index.tokenize(record['Transcript'])) for record in self.records]
+        k1, b = 1.2, 0.75
+        idf = math.log(1 + (3 - 1 + 0.5) / (1 + 0.5))
+        expected = idf * 2 * (k1 + 1) / (2 + k1 * (1 - b + b * lengths[1] / (sum(lengths) / 3)))
+        self.assertAlmostEqual(rows[0][1], expected, places=5)
+
+    def test_term_lists_add_to_every_chunk_of_their_video(self):
+        index = bm25_index.BM25Index(self.directory, self.vectors)
+        index.build({3: 'wire stripper'})
+        self.assertEqual([row for row, _ in index.search_rows('stripper', k=5)], [2])
+        self.assertEqual(index.search_rows('wire', k=5)[0][0], 2)  # Text match plus term-list bonus
+
+    def test_incremental_builds_merge_segments_and_remove_old_files(self):
+        index = bm25_index.BM25Index(self.directory, self.vectors)
+        index.fields['text'].max_segments = 2
+        self.assertEqual(index.build(), (3, 0))
+        self.assertEqual(index.build(), (0, 0))  # Nothing new, no empty segment
+
+        for video_id in (4, 5):
+            self.vectors.build([transcript_record(video_id, f'panel schedule number {video_id}')])
+            self.assertEqual(index.build(), (1, 0))
+        self.assertEqual(index.meta['fields']['text']['segments'], ['text_3'])
+        self.assertEqual(sorted(name for name in os.listdir(self.directory) if name.startswith('text_')),
+                         sorted(f'text_3{suffix}' for suffix in ('_vocab.json', '_doc_ids.npy', '_tfs.npy',
+                                                                 '_doc_keys.npy', '_doc_lengths.npy')))
+
+        reopened = bm25_index.BM25Index(self.directory, vector_index.VectorIndex(self.vectors.directory))
+        self.assertEqual([row for row, _ in reopened.search_rows('panel schedule', k=5)], [3, 4])
+        self.assertEqual([row for row, _ in reopened.search_rows('gfci', k=5)], [1])
+
+    def test_unbuilt_or_stale_index_raises_like_the_vector_index(self):
+        with self.assertRaisesRegex(ValueError, 'No BM25 index'):
+            bm25_index.BM25Index(self.directory, self.vectors).search_rows('gfci')
+
+        bm25_index.BM25Index(self.directory, self.vectors).build()
+        self.vectors.build(list(reversed(self.records)), rebuild=True)  # Same videos, other rows
+        index = bm25_index.BM25Index(self.directory, vector_index.VectorIndex(self.vectors.directory))
+        with self.assertRaisesRegex(ValueError, 'predates the current vector index'):
+            index.search_rows('gfci')
+
+        index.build()
+        self.assertEqual(index.search(['gfci'], k=1)[0][0]['VideoID'], 2)
+
+if __name__ == '__main__':
+    unittest.main()